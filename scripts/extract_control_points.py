@@ -0,0 +1,165 @@
+"""
+Extracts the contour of the object on every frame of a recording and samples it into
+index-consistent control points, the layout of fixed_control_points.npy: (frames, control points, 2).
+
+The frames are segmented in parallel processes, then the control points of every frame are aligned
+with the ones of the previous frame, so the same index follows the same part of the contour.
+
+usage:
+    python scripts/extract_control_points.py data/sponge_centre
+    python scripts/extract_control_points.py data/*/ --num-points 47 --workers 4
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import cv2
+
+from generate_finger_position_file import get_finger_mask
+from video_decoding import decode_chunk, get_video_info
+
+NUM_CONTROL_POINTS: int = 47
+OUTPUT_FILE_NAME: str = "extracted_control_points.npy"
+SUBSAMPLING: int = 8  # candidate contour points per control point when aligning consecutive frames
+
+# both the sponge and the plasticine are yellow, the finger is red and the background is dark
+OBJECT_HSV_LOWER = np.array([15, 170, 60], dtype=np.uint8)
+OBJECT_HSV_UPPER = np.array([35, 255, 255], dtype=np.uint8)
+MIN_REGION_FRACTION: float = 0.1  # regions smaller than this fraction of the largest one are noise
+MORPHOLOGY_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
+# finger pixels closer than 15px to the parts of a split object join them
+BRIDGE_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (31, 31))
+
+
+def get_split_parts(mask: np.ndarray, finger_mask: np.ndarray) -> np.ndarray:
+    """
+    Returns the mask of the parts of the object when the finger splits it in two, None otherwise.
+    The parts are the large regions next to the finger, one of them the largest region,
+    other yellow regions of the frame are left out.
+    """
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(mask)
+    if num_labels < 3:
+        return None
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    large_labels = 1 + np.flatnonzero(areas > MIN_REGION_FRACTION * areas.max())
+    next_to_finger = np.unique(labels[cv2.dilate(finger_mask, MORPHOLOGY_KERNEL) > 0])
+    parts = np.intersect1d(large_labels, next_to_finger)
+    if parts.shape[0] < 2 or 1 + np.argmax(areas) not in parts:
+        return None
+    return np.isin(labels, parts).astype(np.uint8) * 255
+
+
+def segment_object(frame: np.ndarray) -> np.ndarray:
+    """
+    Returns the outer contour of the largest yellow region of the frame, shape: (points, 2),
+    oriented counter-clockwise in image coordinates.
+    """
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, OBJECT_HSV_LOWER, OBJECT_HSV_UPPER)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, MORPHOLOGY_KERNEL)
+    if not mask.any():
+        raise Exception("The object was not found on the frame.")
+
+    finger_mask = get_finger_mask(hsv)
+    parts = get_split_parts(mask, finger_mask)
+    if parts is not None:
+        # only the finger pixels next to the parts fill the gap between them,
+        # so the rest of the finger does not become part of the contour
+        mask |= finger_mask & cv2.dilate(parts, BRIDGE_KERNEL)
+
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, MORPHOLOGY_KERNEL)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    contour = max(contours, key=cv2.contourArea).reshape(-1, 2).astype(np.float64)
+    if cv2.contourArea(contour.astype(np.float32), oriented=True) < 0:
+        contour = contour[::-1]
+    return contour
+
+
+def resample_contour(contour: np.ndarray, num_points: int) -> np.ndarray:
+    """
+    Returns num_points equally spaced along the perimeter of the closed contour, starting at its first point.
+    """
+    closed = np.concatenate((contour, contour[:1]))
+    segment_lengths = np.linalg.norm(np.diff(closed, axis=0), axis=1)
+    arc_length = np.concatenate(([0], np.cumsum(segment_lengths)))
+    samples = np.linspace(0, arc_length[-1], num_points, endpoint=False)
+    return np.stack(
+        (np.interp(samples, arc_length, closed[:, 0]), np.interp(samples, arc_length, closed[:, 1])),
+        axis=1,
+    )
+
+
+def extract_contours(video_file: str, start: int, stop: int, num_samples: int) -> np.ndarray:
+    """
+    Segments the frames [start, stop) of the video, used by the worker processes.
+    Returns the densely resampled contours, shape: (stop - start, num_samples, 2).
+    """
+    frames = decode_chunk(video_file, start, stop)
+    if len(frames) != stop - start:
+        raise Exception(f"There was a problem while reading frames {start}-{stop} of {video_file}")
+    return np.array([resample_contour(segment_object(frame), num_samples) for frame in frames])
+
+
+def align_control_points(contours: np.ndarray, num_points: int) -> np.ndarray:
+    """
+    Picks num_points of every dense contour so that each index stays on the same part of the object:
+    the starting sample of each frame is the rotation closest to the control points of the previous frame.
+        contours: shape(frames, num_points * SUBSAMPLING, 2)
+    returns:
+        shape(frames, num_points, 2)
+    """
+    num_samples = contours.shape[1]
+    step = num_samples // num_points
+    control_points = np.empty((contours.shape[0], num_points, 2))
+    control_points[0] = contours[0, ::step][:num_points]
+
+    # index of every control point for every possible starting sample
+    rotations = (np.arange(num_samples)[:, np.newaxis] + np.arange(num_points) * step) % num_samples
+    for frame in range(1, contours.shape[0]):
+        candidates = contours[frame][rotations]  # shape: (num_samples, num_points, 2)
+        errors = np.sum((candidates - control_points[frame - 1]) ** 2, axis=(1, 2))
+        control_points[frame] = candidates[np.argmin(errors)]
+    return control_points
+
+
+def extract_control_points(
+    video_file: str, num_points: int = NUM_CONTROL_POINTS, workers: int = None
+) -> np.ndarray:
+    """
+    Returns the control points of every frame of the video, shape: (frames, num_points, 2).
+    """
+    num_frames = get_video_info(video_file)[0]
+    workers = workers or os.cpu_count()
+    bounds = np.linspace(0, num_frames, workers + 1).astype(int)
+    num_samples = num_points * SUBSAMPLING
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(extract_contours, video_file, start, stop, num_samples)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+            if stop > start
+        ]
+        contours = np.concatenate([future.result() for future in futures])
+    return align_control_points(contours, num_points)
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("recordings", nargs="+", help="recording directories with a video.mp4 file")
+    parser.add_argument("--num-points", type=int, default=NUM_CONTROL_POINTS, help="control points per frame")
+    parser.add_argument("--workers", type=int, default=None, help="parallel processes")
+    parser.add_argument("--output", default=OUTPUT_FILE_NAME, help="name of the file saved in each recording")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    for data_dir in args.recordings:
+        control_points = extract_control_points(
+            os.path.join(data_dir, "video.mp4"), args.num_points, args.workers
+        )
+        # fixed_control_points.npy is stored from the last frame to the first one,
+        # dataset.py flips it back on load
+        output_file = os.path.join(data_dir, args.output)
+        np.save(output_file, np.flip(control_points, axis=0))
+        print(f"{output_file}: {control_points.shape}")
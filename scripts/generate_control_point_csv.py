@@ -1,60 +1,118 @@
-def parse_line(str_line):
-    """Parses dodata from str_line and initializes a control point history."""
-    tokens = str_line.split()
-    ident = tokens[0]
-    birth_time = tokens[1]
-    death_time = tokens[2]
-
-    # History
-    rest = tokens[3:]
-    if rest[0][0] != "[":
-        raise Exception("'[' was expected but found " + rest[0] + " instead.")
-    if rest[-1][-1] != "]":
-        raise Exception("']' was expected but found " + rest[-1] + " instead.")
-    # Remove '[' and ']'
-    rest[0] = rest[0][1:]
-    rest[-1] = rest[-1][:-1]
-
-    hist = []
-    iterator = iter(rest)
-    x_str = next(iterator, False)
-    while x_str:
-        x = x_str[1:]
-        y = next(iterator)
-        prev_neighbour_index = next(iterator)
-        next_neighbour_index = next(iterator)[:-1]
-        x_str = next(iterator, False)
-        hist.append((x, y, prev_neighbour_index, next_neighbour_index))
-
-    return (ident, birth_time, death_time, hist)
-
-
-def convert_hist_to_csv(hist_file: str, csv_file: str):
-    # read .hist
-    hist_lines = []
-    with open(hist_file, "r") as read_file:
-        next(read_file)
-        for line in read_file:
-            hist_lines.append(parse_line(line))
-
-    # create .csv
-    f = open(csv_file, "w")
-    csv_header = "id,time_step,birth_time,death_time,x,y,prev_id,next_id\n"
-    f.write(csv_header)
-    for hist_line in hist_lines:
-        for time, control_point in enumerate(hist_line[3]):
-            time_step = int(hist_line[1]) + time
-            csv_row = [
-                hist_line[0],
-                str(time_step),
-                hist_line[1],
-                hist_line[2],
-                *control_point,
-            ]
-            f.write(",".join(csv_row) + "\n")
-    f.close()
-
-
-hist_file = "data/sponge_centre/control_points.hist"
-csv_file = "data/sponge_centre/control_points.csv"
-convert_hist_to_csv(hist_file, csv_file)
+"""
+Converts the control_points.hist file of every recording into columnar files:
+    control_points.csv: one row per control point and time step
+    control_points.npz: one array per column, it can be loaded directly with ContourHistory
+
+The .hist file is streamed line by line, so only the columns of the .npz are kept in memory.
+
+usage:
+    python scripts/generate_control_point_csv.py                     # all the recordings in data/
+    python scripts/generate_control_point_csv.py data/sponge_centre --no-csv --workers 2
+"""
+import argparse
+import glob
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append("./src")
+from read_data.control_point_reader import HIST_COLUMNS, parse_control_point_values
+
+HIST_FILE_NAME: str = "control_points.hist"
+CSV_FILE_NAME: str = "control_points.csv"
+NPZ_FILE_NAME: str = "control_points.npz"
+
+
+def convert_hist(hist_file: str, csv_file: str = None, npz_file: str = None) -> int:
+    """
+    Writes the .hist file as .csv and/or .npz, returns the number of rows written.
+    """
+    columns = {name: array("i") for name in HIST_COLUMNS}
+    histories = array("i")  # id, birth_time, death_time, number of rows
+    num_rows = 0
+
+    csv = open(csv_file, "w") if csv_file else None
+    try:
+        if csv:
+            csv.write(",".join(HIST_COLUMNS) + "\n")
+        with open(hist_file, "r") as read_file:
+            next(read_file)  # header
+            for line in read_file:
+                if not line.strip():
+                    continue
+                ident, birth_time, death_time, history = parse_control_point_values(line)
+
+                rows = np.empty((history.shape[0], len(HIST_COLUMNS)), dtype=np.int32)
+                rows[:, 0] = ident
+                rows[:, 1] = np.arange(birth_time, birth_time + history.shape[0])
+                rows[:, 2] = birth_time
+                rows[:, 3] = death_time
+                rows[:, 4:] = history
+                num_rows += rows.shape[0]
+
+                if csv:
+                    np.savetxt(csv, rows, fmt="%d", delimiter=",")
+                if npz_file:
+                    histories.extend((ident, birth_time, death_time, rows.shape[0]))
+                    for index, name in enumerate(HIST_COLUMNS):
+                        columns[name].frombytes(np.ascontiguousarray(rows[:, index]).tobytes())
+    finally:
+        if csv:
+            csv.close()
+
+    if npz_file:
+        np.savez(
+            npz_file,
+            histories=np.frombuffer(histories, dtype=np.int32).reshape(-1, 4),
+            **{name: np.frombuffer(column, dtype=np.int32) for name, column in columns.items()},
+        )
+    return num_rows
+
+
+def convert_recording(data_dir: str, write_csv: bool, write_npz: bool) -> tuple[str, int]:
+    """Converts the .hist file of the recording in data_dir."""
+    num_rows = convert_hist(
+        os.path.join(data_dir, HIST_FILE_NAME),
+        os.path.join(data_dir, CSV_FILE_NAME) if write_csv else None,
+        os.path.join(data_dir, NPZ_FILE_NAME) if write_npz else None,
+    )
+    return data_dir, num_rows
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "recordings",
+        nargs="*",
+        help="recording directories, all of data/ by default",
+    )
+    parser.add_argument(
+        "--csv", help="write the .csv file", default=True, action=argparse.BooleanOptionalAction
+    )
+    parser.add_argument(
+        "--npz", help="write the .npz file", default=True, action=argparse.BooleanOptionalAction
+    )
+    parser.add_argument(
+        "--workers", help="number of recordings converted in parallel", type=int, default=os.cpu_count()
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    recordings = args.recordings or sorted(
+        os.path.dirname(hist_file)
+        for hist_file in glob.glob(os.path.join("data", "*", HIST_FILE_NAME))
+    )
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(convert_recording, data_dir, args.csv, args.npz)
+            for data_dir in recordings
+        ]
+        for future in futures:
+            data_dir, num_rows = future.result()
+            print(f"{data_dir}: {num_rows} rows")
@@ -1,20 +1,120 @@
 """
 Tracks the finger and produces a text file with coordinates of its center
 at each frame.
+
+usage:
+    python scripts/generate_finger_position_file.py sponge_shortside            # shows the tracking, press ESC to exit
+    python scripts/generate_finger_position_file.py --batch --save              # all the recordings, without GUI
 """
 
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 import cv2
 
+from video_decoding import iter_frames
+
 
 class ColourTracker:
+    """
+    Tracks the finger by its colour: the pixels of the roi with the hue of the finger are thresholded
+    in HSV and the new center is the centroid of that mask, inside a disc around the previous center.
+    The buffers are allocated once and reused on every frame.
+    """
+
+    hue_tolerance = 10  # OpenCV hue goes from 0 to 179, the largest distance to the hue of the finger
+    hue_coverage = 0.95  # fraction of the finger pixels whose hues are accepted
+    min_saturation = 100
+    min_value = 60
+    search_ratio = 1.5  # radius of the disc searched around the previous center, based on the finger radius
+    min_visible_fraction = 0.2  # fraction of the finger area that must be found to accept the update
+
     def init(self, roi, circle_box):
         cx, cy, r = circle_box
+        self.radius = r
         self.bbox = (cx - r, cy - r, 2 * r, 2 * r)
+        self.finger_area = np.pi * r**2
+        self.confidence = 1.0
+        self._buffers_shape = None
+
+        # learn the hues of the finger from the saturated pixels inside the initial circle
+        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+        circle_mask = np.zeros(roi.shape[:2], dtype=np.uint8)
+        cv2.circle(circle_mask, (int(cx), int(cy)), int(r), 255, -1)
+        saturated = hsv[..., 1] >= self.min_saturation
+        finger_hues = hsv[(circle_mask > 0) & saturated][:, 0]
+        if finger_hues.shape[0] == 0:
+            return False
+        # mean of the hue as an angle, since red is on both ends of the hue range
+        angles = finger_hues.astype(np.float64) * (2 * np.pi / 180)
+        finger_hue = np.arctan2(np.sin(angles).mean(), np.cos(angles).mean()) * 180 / (2 * np.pi)
+
+        def hue_distance(hues):
+            distance = np.abs(hues - finger_hue) % 180
+            return np.minimum(distance, 180 - distance)
+
+        tolerance = min(np.quantile(hue_distance(finger_hues), self.hue_coverage), self.hue_tolerance)
+
+        # hues more frequent around the finger than on it belong to the object or the background
+        finger_histogram = np.bincount(finger_hues, minlength=180) / finger_hues.shape[0]
+        background_hues = hsv[(circle_mask == 0) & saturated][:, 0]
+        background_histogram = np.bincount(background_hues, minlength=180) / max(background_hues.shape[0], 1)
+
+        # lookup table of the hues that belong to the finger
+        hues = np.arange(256)
+        accepted = (hue_distance(hues) <= tolerance) & (hues < 180)
+        accepted[:180] &= finger_histogram >= background_histogram
+        self.hue_lut = np.where(accepted, 255, 0).astype(np.uint8)
+        self.sv_lower = np.array([0, self.min_saturation, self.min_value], dtype=np.uint8)
+        self.sv_upper = np.array([255, 255, 255], dtype=np.uint8)
 
         return True
 
-    def update(self, roi):
+    def _allocate_buffers(self, shape):
+        height, width = shape[:2]
+        self._hsv = np.empty((height, width, 3), dtype=np.uint8)
+        self._hue = np.empty((height, width), dtype=np.uint8)
+        self._hue_mask = np.empty((height, width), dtype=np.uint8)
+        self._sv_mask = np.empty((height, width), dtype=np.uint8)
+        self._mask = np.empty((height, width), dtype=np.uint8)
+        self._search_mask = np.empty((height, width), dtype=np.uint8)
+        self._buffers_shape = shape
+
+    def update(self, roi, center=None):
+        """
+        :param center: previous center of the finger in roi coordinates, the center of the roi by default
+        """
+        if roi.shape != self._buffers_shape:  # the roi is smaller next to the borders of the frame
+            self._allocate_buffers(roi.shape)
+        if center is None:
+            center = (roi.shape[1] / 2, roi.shape[0] / 2)
+
+        cv2.cvtColor(roi, cv2.COLOR_BGR2HSV, dst=self._hsv)
+        cv2.extractChannel(self._hsv, 0, dst=self._hue)
+        cv2.LUT(self._hue, self.hue_lut, dst=self._hue_mask)
+        cv2.inRange(self._hsv, self.sv_lower, self.sv_upper, dst=self._sv_mask)
+        cv2.bitwise_and(self._hue_mask, self._sv_mask, dst=self._mask)
+        self._search_mask.fill(0)
+        cv2.circle(
+            self._search_mask, (int(round(center[0])), int(round(center[1]))), int(self.search_ratio * self.radius), 255, -1
+        )
+        cv2.bitwise_and(self._mask, self._search_mask, dst=self._mask)
+
+        moments = cv2.moments(self._mask, binaryImage=True)
+        # both a partly hidden finger and pixels of other objects make the area differ from the finger's
+        area_ratio = moments["m00"] / self.finger_area
+        self.confidence = area_ratio if area_ratio <= 1 else 1 / area_ratio
+        if self.confidence < self.min_visible_fraction:
+            return False, self.bbox
+
+        cx = moments["m10"] / moments["m00"]
+        cy = moments["m01"] / moments["m00"]
+        r = self.radius
+        self.bbox = (cx - r, cy - r, 2 * r, 2 * r)
         return True, self.bbox
 
 
@@ -22,6 +122,35 @@ def ColourTracker_create():
     return ColourTracker()
 
 
+FINGER_HSV_RANGES = (  # red is on both ends of the hue range
+    (np.array([0, 150, 60], dtype=np.uint8), np.array([12, 255, 255], dtype=np.uint8)),
+    (np.array([168, 150, 60], dtype=np.uint8), np.array([179, 255, 255], dtype=np.uint8)),
+)
+
+
+def get_finger_mask(hsv):
+    """
+    Returns the mask of the red pixels of an HSV image, also used by extract_control_points.py
+    """
+    mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
+    for lower, upper in FINGER_HSV_RANGES:
+        mask |= cv2.inRange(hsv, lower, upper)
+    return mask
+
+
+def detect_finger(img):
+    """
+    Finds the finger on img as the largest red region, so the initial position does not have to be typed by hand.
+    :return: {"x": int, "y": int, "r": int} like intial_finger_positions
+    """
+    mask = get_finger_mask(cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        raise Exception("The finger was not found on the image.")
+    (cx, cy), r = cv2.minEnclosingCircle(max(contours, key=cv2.contourArea))
+    return {"x": int(round(cx)), "y": int(round(cy)), "r": int(round(r))}
+
+
 class FingerTracker:
     tracker_color = (255, 255, 255)  # Color used to draw the tracker's position
     circle_tracker_color = (
@@ -30,12 +159,13 @@ class FingerTracker:
         0,
     )  # Color used to draw the finger's tracked circle
 
-    def __init__(self, first_img, finger_data, tracker_creator_name=None):
+    def __init__(self, first_img, finger_data, tracker_creator_name=None, draw=True):
         """
 
         :param first_img:
         :param finger_data:
         :param tracker_creator_name: Name of OpenCV tracker create function, if one of them works.
+        :param draw: draw the roi and the tracked circle on the frames
         """
         roi_ratio = self.roi_ratio = 2  # based on the finger radio
         # Use ROI around finger
@@ -45,16 +175,13 @@ class FingerTracker:
         r = finger_data["r"]
         self.circle_data = (cx, cy, r)
 
-        x1 = cx - roi_ratio * r
-        x2 = cx + roi_ratio * r
-        y1 = cy - roi_ratio * r
-        y2 = cy + roi_ratio * r
+        x1, y1, x2, y2 = self.get_roi_coords(first_img)
         roi = first_img[y1:y2, x1:x2]  # numpy shape: (120, 120, 3) white box
 
         # bbox = cv2.selectROI(first_img)  # Allows the user to select the region using the mouse
         bbox = (
-            (roi_ratio - 1) * r,
-            (roi_ratio - 1) * r,
+            cx - r - x1,
+            cy - r - y1,
             2 * r,
             2 * r,
         )  # in roi local coordinates
@@ -65,10 +192,30 @@ class FingerTracker:
             ok = tracker.init(roi, bbox)
         else:
             tracker = ColourTracker_create()
-            ok = tracker.init(roi, (roi_ratio * r, roi_ratio * r, r))
+            ok = tracker.init(roi, (cx - x1, cy - y1, r))
+        # the init of the OpenCV trackers returns None on recent versions
+        if ok is False:
+            raise Exception(f"The tracker could not be initialized on the finger at {self.circle_data}.")
 
         self.tracker = tracker
-        self.draw_inidicators(first_img, (x1, y1, x2, y2), bbox)
+        self.draw = draw
+        self.confidence = 1.0  # confidence of the last tracked position
+        if self.draw:
+            self.draw_inidicators(first_img, (x1, y1, x2, y2), bbox)
+
+    def get_roi_coords(self, img):
+        """
+        Returns the coordinates (x1, y1, x2, y2) of the roi around the finger, clipped to the borders of img
+        """
+        cx, cy, r = self.circle_data
+        roi_ratio = self.roi_ratio
+        height, width = img.shape[:2]
+
+        x1 = max(cx - roi_ratio * r, 0)
+        x2 = min(cx + roi_ratio * r, width)
+        y1 = max(cy - roi_ratio * r, 0)
+        y2 = min(cy + roi_ratio * r, height)
+        return x1, y1, x2, y2
 
     #  img -> roi_coords -> bbox : contention hierarchy. bbox is inside roi and so on
     def draw_inidicators(self, img, roi_coords, bbox):
@@ -88,17 +235,21 @@ class FingerTracker:
         cv2.rectangle(img, (x1, y1), (x2, y2), FingerTracker.tracker_color, 2, 1)  # roi
         cv2.circle(img, (cx, cy), r, FingerTracker.circle_tracker_color)  # finger
 
-    def track(self, next_frame):
+    def track(self, next_frame) -> bool:
+        """
+        Updates circle_data with the position of the finger in next_frame.
+        Returns False if the tracker lost the finger.
+        """
         cx, cy, r = self.circle_data
-        roi_ratio = self.roi_ratio
-
-        x1 = cx - roi_ratio * r
-        x2 = cx + roi_ratio * r
-        y1 = cy - roi_ratio * r
-        y2 = cy + roi_ratio * r
+        x1, y1, x2, y2 = self.get_roi_coords(next_frame)
         roi = next_frame[y1:y2, x1:x2]
 
-        successful_update, bbox = self.tracker.update(roi)
+        if isinstance(self.tracker, ColourTracker):
+            successful_update, bbox = self.tracker.update(roi, (cx - x1, cy - y1))
+        else:
+            successful_update, bbox = self.tracker.update(roi)
+        # OpenCV trackers do not report a confidence
+        self.confidence = getattr(self.tracker, "confidence", float(successful_update))
 
         if successful_update:
             new_cx = int(x1 + (bbox[2] + 2 * bbox[0]) / 2)
@@ -106,11 +257,12 @@ class FingerTracker:
             self.circle_data = (new_cx, new_cy, r)
 
             # visual bug: delayed roi, the old coordinates are being passed
-            self.draw_inidicators(next_frame, (x1, y1, x2, y2), bbox)
-        else:
+            if self.draw:
+                self.draw_inidicators(next_frame, (x1, y1, x2, y2), bbox)
+        elif self.draw:
             print("Tracking Failure")
             cv2.putText(
-                frame,
+                next_frame,
                 "Tracking failure detected",
                 (100, 80),
                 cv2.FONT_HERSHEY_SIMPLEX,
@@ -118,6 +270,7 @@ class FingerTracker:
                 (0, 0, 255),
                 2,
             )
+        return successful_update
 
 
 intial_finger_positions = {
@@ -128,72 +281,134 @@ intial_finger_positions = {
     "plasticine_longside": {"x": 721, "y": 167, "r": 30},
     "plasticine_shortside": {"x": 724, "y": 31, "r": 26},
 }
-# press ESC to exit the visualization
-if __name__ == "__main__":
-    CVWAIT = 20  # reproduction speed of video
-    SAVE_DATA = False  # if true, the read info will be saved into file
-    dir_name = "sponge_shortside"
-    input_file = f"data/{dir_name}/video.mp4"
-    output_file = f"data/{dir_name}/finger_position.txt"
-    cv2_tracker_name = "TrackerKCF_create"
-    cv2_tracker_name = "TrackerMIL_create"
-    print("Analizing file: " + input_file)
-
-    if SAVE_DATA:
-        finger_file = open(output_file, "w")
-        print("Saving to ", output_file)
-
-    cap = cv2.VideoCapture(input_file)
-    any_problem, frame = cap.read()
-    if not any_problem:
-        raise Exception("There was a problem while reading the video")
-    finger_tracker = FingerTracker(
-        frame, intial_finger_positions[dir_name], cv2_tracker_name
-    )
-    if SAVE_DATA:
-        finger_file.write(
-            "{x} {y}\n".format(
-                x=finger_tracker.circle_data[0], y=finger_tracker.circle_data[1]
-            )
-        )
-    window_name = "Finger position " + dir_name
-    cv2.imshow(
-        window_name, frame
-    )  # show first frame with the generated roi's from FingerTracker
-
-    cv2.waitKey(CVWAIT) & 0xFF
 
-    pause = True
-    step = 0
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            break
+DATA_DIR: str = "data"
+POSITION_FILE_NAME: str = "finger_position.txt"
+CONFIDENCE_FILE_NAME: str = "finger_tracking_confidence.txt"
+CV2_TRACKER_NAME: str = "TrackerMIL_create"  # "TrackerKCF_create"
+
+
+def track_video(
+    dir_name: str, tracker_name: str = None, cv_wait: int = None, decode_workers: int = None
+):
+    """
+    Tracks the finger on every frame of data/<dir_name>/video.mp4.
+    :param tracker_name: name of the OpenCV tracker create function, None to use ColourTracker
+    :param cv_wait: if given, every frame is shown and waits cv_wait ms, ESC stops the tracking
+    :param decode_workers: processes decoding the video ahead of the tracker, see video_decoding.iter_frames
+    :return: positions (frames, 2), confidences (frames,) and the processed frames per second
+    """
+    input_file = os.path.join(DATA_DIR, dir_name, "video.mp4")
+    show = cv_wait is not None
+    window_name = "Finger position " + dir_name
 
+    start_time = time.perf_counter()
+    frames = iter_frames(input_file, workers=decode_workers)
+    _, frame = next(frames, (None, None))
+    if frame is None:
+        raise Exception("There was a problem while reading the video " + input_file)
+
+    finger_data = intial_finger_positions.get(dir_name) or detect_finger(frame)
+    finger_tracker = FingerTracker(frame, finger_data, tracker_name, draw=show)
+    positions = [finger_tracker.circle_data[:2]]
+    confidences = [1.0]
+    if show:
+        cv2.imshow(window_name, frame)  # show first frame with the generated roi's from FingerTracker
+        cv2.waitKey(cv_wait)
+
+    for _, frame in frames:
         finger_tracker.track(frame)
+        positions.append(finger_tracker.circle_data[:2])
+        confidences.append(finger_tracker.confidence)
+
+        if show:
+            print(f"{len(positions) - 1} - {positions[-1][0]} {positions[-1][1]}")
+            cv2.imshow(window_name, frame)
+            if cv2.waitKey(cv_wait) & 0xFF == 27:  # Exit if ESC pressed
+                break
+
+    frames.close()
+    frames_per_second = len(positions) / (time.perf_counter() - start_time)
+    return np.array(positions), np.array(confidences, dtype=np.float32), frames_per_second
+
+
+def save_tracking(dir_name: str, positions: np.ndarray, confidences: np.ndarray):
+    """Writes the finger position file and the tracking confidence of every frame."""
+    np.savetxt(os.path.join(DATA_DIR, dir_name, POSITION_FILE_NAME), positions, fmt="%d")
+    np.savetxt(os.path.join(DATA_DIR, dir_name, CONFIDENCE_FILE_NAME), confidences, fmt="%.3f")
+
+
+def track_recording(dir_name: str, tracker_name: str, save: bool):
+    """Headless tracking of one recording, used by the batch mode."""
+    # the recordings are already tracked in parallel, so each one is decoded sequentially
+    positions, confidences, frames_per_second = track_video(dir_name, tracker_name, decode_workers=1)
+    if save:
+        save_tracking(dir_name, positions, confidences)
+    return dir_name, positions.shape[0], float(np.mean(confidences)), frames_per_second
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Tracks the finger on the videos of the recordings.")
+    parser.add_argument(
+        "recordings",
+        nargs="*",
+        default=sorted(
+            os.path.basename(os.path.dirname(video_file))
+            for video_file in glob.glob(os.path.join(DATA_DIR, "*", "video.mp4"))
+        ),
+        help="names of the recordings in data/, all of them by default",
+    )
+    parser.add_argument(
+        "--batch",
+        help="track all the recordings in parallel processes without GUI",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--save",
+        help="save the finger position and confidence files",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--tracker",
+        help=f"'colour' to use ColourTracker or the name of an OpenCV tracker create function, e.g. {CV2_TRACKER_NAME}",
+        default="colour",
+    )
+    parser.add_argument("--workers", help="parallel processes on batch mode", type=int, default=None)
+    parser.add_argument("--cv-wait", help="ms each frame is shown (reproduction speed)", type=int, default=20)
+    return parser.parse_args()
 
-        record = "{x} {y}\n".format(
-            x=finger_tracker.circle_data[0], y=finger_tracker.circle_data[1]
+
+if __name__ == "__main__":
+    args = get_args()
+    tracker_name = None if args.tracker == "colour" else args.tracker
+
+    if args.batch:
+        start_time = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [
+                executor.submit(track_recording, dir_name, tracker_name, args.save)
+                for dir_name in args.recordings
+            ]
+            total_frames = 0
+            for future in futures:
+                dir_name, num_frames, mean_confidence, frames_per_second = future.result()
+                total_frames += num_frames
+                print(
+                    f"{dir_name}: {num_frames} frames, {frames_per_second:.1f} fps, "
+                    f"mean confidence {mean_confidence:.3f}"
+                )
+        elapsed = time.perf_counter() - start_time
+        print(f"Total: {total_frames} frames in {elapsed:.2f}s ({total_frames / elapsed:.1f} fps)")
+    else:  # press ESC to exit the visualization
+        dir_name = args.recordings[0]
+        print("Analizing file: " + os.path.join(DATA_DIR, dir_name, "video.mp4"))
+        positions, confidences, frames_per_second = track_video(
+            dir_name, tracker_name, cv_wait=args.cv_wait
         )
-        print(str(step) + " - " + record, end="")
-        if SAVE_DATA:
-            finger_file.write(record)
-        cv2.imshow(window_name, frame)
-
-        # Exit if ESC pressed
-        k = (
-            cv2.waitKey(CVWAIT) & 0xFF
-        )  # will get stucked here in the end if ESC is not pressed
-        if k == 27:
-            pause = False
-            break
-        step = step + 1
-
-    if SAVE_DATA:
-        finger_file.close()
-
-    # When everything gets done, release the capture
-    if pause:
+        if args.save:
+            save_tracking(dir_name, positions, confidences)
+            print("Saved to ", os.path.join(DATA_DIR, dir_name, POSITION_FILE_NAME))
         cv2.waitKey(-1)
-    cap.release()
-    cv2.destroyAllWindows()
+        cv2.destroyAllWindows()
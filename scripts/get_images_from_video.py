@@ -2,42 +2,26 @@
 import cv2
 import os
 
+from video_decoding import iter_frames
+
 data_dir = './data/sponge_shortside'
 video_path = data_dir + '/video.mp4'
 images_dir = data_dir + '/images'
-# Read the video from specified path
-cam = cv2.VideoCapture(video_path)
-
-try:
-    # creating a folder named data
-    if not os.path.exists(images_dir):
-        os.makedirs(images_dir)
-
-# if not created then raise error
-except OSError:
-    print ('Error: Creating directory of data')
 
-# frame
-currentframe = 0
+# the guard is needed since the frames are decoded in parallel processes
+if __name__ == "__main__":
+    try:
+        # creating a folder named data
+        if not os.path.exists(images_dir):
+            os.makedirs(images_dir)
 
-while(True):
-    # reading from frame
-    ret,frame = cam.read()
+    # if not created then raise error
+    except OSError:
+        print ('Error: Creating directory of data')
 
-    if ret:
-        # if video is still left continue creating images
+    for currentframe, frame in iter_frames(video_path):
         name = images_dir + '/frame' + str(currentframe) + '.jpg'
         print ('Creating...' + name)
 
         # writing the extracted images
         cv2.imwrite(name, frame)
-
-        # increasing counter so that it will
-        # show how many frames are created
-        currentframe += 1
-    else:
-        break
-
-# Release all space and windows once done
-cam.release()
-cv2.destroyAllWindows()
@@ -0,0 +1,119 @@
+"""
+Video decoding shared by the scripts.
+
+The video is split into chunks of consecutive frames, every worker process seeks to the start of
+its chunk and decodes it. The frames are handed back in order, and only a bounded number of chunks
+is decoded ahead of the consumer, so memory does not grow with the length of the video.
+Frames can be cropped and downscaled while decoding, which also reduces the data sent between processes.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import cv2
+
+CHUNK_SIZE: int = 16  # frames decoded by a worker per task
+
+
+def get_video_info(video_file: str) -> tuple[int, float, int, int]:
+    """Returns the number of frames, frames per second, width and height of the video."""
+    cap = cv2.VideoCapture(video_file)
+    if not cap.isOpened():
+        raise Exception("There was a problem while opening the video " + video_file)
+    info = (
+        int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        cap.get(cv2.CAP_PROP_FPS),
+        int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    )
+    cap.release()
+    return info
+
+
+def transform_frame(frame: np.ndarray, scale: float = None, roi: tuple = None) -> np.ndarray:
+    """
+    Crops the frame to roi (x1, y1, x2, y2) and then resizes it by scale.
+    """
+    if roi is not None:
+        x1, y1, x2, y2 = roi
+        frame = frame[y1:y2, x1:x2]
+    if scale is not None and scale != 1:
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def decode_chunk(
+    video_file: str, start: int, stop: int, scale: float = None, roi: tuple = None
+) -> list[np.ndarray]:
+    """
+    Decodes the frames [start, stop) of the video, the video may end before stop.
+    """
+    cap = cv2.VideoCapture(video_file)
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    frames = []
+    for _ in range(start, stop):
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(transform_frame(frame, scale, roi))
+    cap.release()
+    return frames
+
+
+def iter_frames(
+    video_file: str,
+    workers: int = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_pending_chunks: int = None,
+    scale: float = None,
+    roi: tuple = None,
+    start: int = 0,
+    stop: int = None,
+):
+    """
+    Yields (frame_index, frame) for the frames [start, stop) of the video, in order.
+    :param workers: decoding processes, with 1 the video is decoded sequentially in this process
+    :param chunk_size: consecutive frames decoded by a worker per task
+    :param max_pending_chunks: chunks decoded ahead of the consumer, two per worker by default
+    :param scale: resize factor applied while decoding
+    :param roi: (x1, y1, x2, y2) crop applied while decoding, before scale
+    """
+    num_frames = get_video_info(video_file)[0]
+    stop = num_frames if stop is None else min(stop, num_frames)
+    workers = workers or os.cpu_count()
+
+    if workers <= 1:
+        cap = cv2.VideoCapture(video_file)
+        if start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for frame_index in range(start, stop):
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield frame_index, transform_frame(frame, scale, roi)
+        cap.release()
+        return
+
+    max_pending_chunks = max_pending_chunks or 2 * workers
+    chunk_starts = iter(range(start, stop, chunk_size))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        def submit_next_chunk():
+            chunk_start = next(chunk_starts, None)
+            if chunk_start is not None:
+                chunk_stop = min(chunk_start + chunk_size, stop)
+                pending.append(
+                    (chunk_start, executor.submit(decode_chunk, video_file, chunk_start, chunk_stop, scale, roi))
+                )
+
+        for _ in range(max_pending_chunks):
+            submit_next_chunk()
+        while pending:
+            chunk_start, future = pending.popleft()
+            frames = future.result()
+            submit_next_chunk()
+            for offset, frame in enumerate(frames):
+                yield chunk_start + offset, frame
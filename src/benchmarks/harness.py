@@ -0,0 +1,171 @@
+"""
+    Timing and reporting of the benchmark suite.
+
+    A benchmark is a setup function that receives the scale of its inputs and returns the callable to time,
+    so building the inputs, and tracing the tf.functions on the first call, are never measured.
+    The results are written as JSON, every entry holds the statistics of one benchmark at one scale.
+"""
+
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Callable
+
+import numpy as np
+
+RESULTS_VERSION: int = 1
+MIN_ROUND_TIME: float = 0.2  # seconds, calls per round are increased until a round takes this long
+MAX_CALLS_PER_ROUND: int = 1000
+
+BENCHMARKS: dict[str, Callable[[int], Callable[[], object]]] = {}
+
+
+class BenchmarkSkipped(Exception):
+    """Raised by a setup function when the benchmark cannot run, e.g. an optional dependency is missing."""
+
+
+def benchmark(name: str):
+    """Registers the decorated setup function under name."""
+
+    def register(setup: Callable[[int], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def time_function(function: Callable[[], object], rounds: int, min_round_time: float = MIN_ROUND_TIME) -> dict:
+    """
+    Times function like timeit.autorange: after a warm-up call the calls per round are doubled
+    until a round takes min_round_time, then the seconds per call of every round are collected.
+    """
+    function()  # warm-up, tf.functions are traced here
+    number = 1
+    while True:
+        start_time = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_round_time or number >= MAX_CALLS_PER_ROUND:
+            break
+        number *= 2
+
+    times = [elapsed / number]
+    for _ in range(rounds - 1):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start_time) / number)
+
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "max": max(times),
+        "rounds": len(times),
+        "calls_per_round": number,
+    }
+
+
+def run_benchmarks(names: list[str], scales: list[int], rounds: int, verbose: bool = True) -> list[dict]:
+    """
+    Runs the benchmarks at every scale. The output of the benchmarked code is silenced.
+    """
+    results = []
+    for name in names:
+        for scale in scales:
+            entry = {"name": name, "scale": scale}
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    function = BENCHMARKS[name](scale)
+                    entry["stats"] = time_function(function, rounds)
+            except BenchmarkSkipped as reason:
+                entry["skipped"] = str(reason)
+            results.append(entry)
+            if verbose:
+                print(format_entry(entry))
+    return results
+
+
+def format_entry(entry: dict) -> str:
+    label = f"{entry['name']} x{entry['scale']}"
+    if "skipped" in entry:
+        return f"{label:<45} skipped: {entry['skipped']}"
+    stats = entry["stats"]
+    return f"{label:<45} median {stats['median'] * 1e3:10.3f} ms  min {stats['min'] * 1e3:10.3f} ms  ({stats['rounds']}x{stats['calls_per_round']})"
+
+
+def get_machine_info() -> dict:
+    info = {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+    try:
+        import tensorflow as tf
+
+        info["tensorflow"] = tf.__version__
+    except ImportError:
+        pass
+    return info
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def save_results(results: list[dict], output_file: str):
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(output_file, "w") as json_file:
+        json.dump(
+            {
+                "version": RESULTS_VERSION,
+                "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                "commit": get_commit(),
+                "machine": get_machine_info(),
+                "results": results,
+            },
+            json_file,
+            indent=2,
+        )
+
+
+def compare_results(results: list[dict], baseline_file: str, threshold: float) -> list[str]:
+    """
+    Compares the medians with the ones of a previous results file,
+    returns the benchmarks that are slower than threshold times the baseline.
+    """
+    with open(baseline_file) as json_file:
+        baseline = {
+            (entry["name"], entry["scale"]): entry["stats"]["median"]
+            for entry in json.load(json_file)["results"]
+            if "stats" in entry
+        }
+
+    regressions = []
+    for entry in results:
+        key = (entry["name"], entry["scale"])
+        if "stats" not in entry or key not in baseline:
+            continue
+        ratio = entry["stats"]["median"] / baseline[key]
+        flag = "REGRESSION" if ratio > threshold else ""
+        print(f"{entry['name'] + ' x' + str(entry['scale']):<45} {ratio:6.2f}x baseline {flag}")
+        if ratio > threshold:
+            regressions.append(f"{entry['name']} x{entry['scale']}")
+    return regressions
@@ -0,0 +1,53 @@
+"""
+    Runs the benchmark suite and writes the results as JSON.
+
+    usage:
+        python src/benchmarks/run_benchmarks.py
+        python src/benchmarks/run_benchmarks.py --filter dataset normalize --scales 1 10
+        python src/benchmarks/run_benchmarks.py --compare src/benchmarks/results/baseline.json
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append('./src')
+
+from benchmarks.harness import BENCHMARKS, run_benchmarks, save_results, compare_results
+import benchmarks.suite  # registers the benchmarks
+
+RESULTS_DIR: str = "src/benchmarks/results"
+DEFAULT_SCALES: tuple[int, ...] = (1, 10)
+DEFAULT_ROUNDS: int = 5
+REGRESSION_THRESHOLD: float = 1.2  # median slower than this times the baseline
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--filter", nargs="*", default=None, help="run only the benchmarks whose name contains any of these")
+    parser.add_argument("--scales", nargs="+", type=int, default=list(DEFAULT_SCALES), help="input scales, 1 is the size of a recording")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="timed rounds per benchmark")
+    parser.add_argument("--output", default=None, help="results file, a timestamped file in src/benchmarks/results by default")
+    parser.add_argument("--compare", default=None, help="previous results file to compare the medians with")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="slowdown reported as a regression")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    names = [
+        name for name in BENCHMARKS
+        if not args.filter or any(pattern in name for pattern in args.filter)
+    ]
+    results = run_benchmarks(names, args.scales, args.rounds)
+
+    output_file = args.output or os.path.join(RESULTS_DIR, time.strftime("benchmarks_%Y_%m_%d-%H_%M_%S.json"))
+    save_results(results, output_file)
+    print(f"Results saved in {output_file}")
+
+    if args.compare:
+        regressions = compare_results(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,217 @@
+"""
+    Benchmarks of the hot paths: reading the control point history, building and normalizing
+    the datasets, one training step, one rollout and one frame of the prediction gifs.
+
+    At scale s the inputs have s times the control points and s times the frames of a recording.
+    The rollout of the models always runs 100 steps, so only its batch grows with the scale.
+    The benchmarks ending in _xla run the same code compiled with XLA, see utils.xla.
+"""
+
+import io
+import os
+import tempfile
+
+import numpy as np
+
+from benchmarks.harness import benchmark, BenchmarkSkipped
+from benchmarks.synthetic import (
+    NUM_CONTROL_POINTS,
+    NUM_FRAMES,
+    IMAGE_SHAPE,
+    synthetic_polygons,
+    synthetic_finger,
+    write_synthetic_hist,
+)
+from read_data.control_point_reader import ContourHistory
+from utils.dataset_creation import create_dataset, create_calculated_values_dataset
+from utils.normalization import normalize_polygons, normalize_finger_position, normalize_force
+
+
+def get_recording(scale: int):
+    polygons = synthetic_polygons(NUM_FRAMES * scale, NUM_CONTROL_POINTS * scale)
+    finger_positions, finger_forces = synthetic_finger(NUM_FRAMES * scale)
+    return polygons, finger_positions, finger_forces
+
+
+def get_model_dataset(scale: int, num_frames: int):
+    """Normalized inputs of the models, with twice the control points like the mirrored training set."""
+    polygons = synthetic_polygons(num_frames, 2 * NUM_CONTROL_POINTS * scale)
+    finger_positions, finger_forces = synthetic_finger(num_frames)
+    X_control_points, X_finger, Y = create_calculated_values_dataset(
+        normalize_polygons(polygons),
+        normalize_finger_position(polygons, finger_positions),
+        normalize_force(finger_forces),
+    )
+    return X_control_points.astype(np.float32), X_finger.astype(np.float32), Y.astype(np.float32)
+
+
+def get_model(teacher_forcing: bool, jit_compile: bool = False):
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
+    import tensorflow as tf  # imported here so the benchmarks of the data pipeline start quickly
+    tf.get_logger().setLevel('ERROR')
+    from subclassing_models import DeformationTrackerBiFlowModel
+
+    model = DeformationTrackerBiFlowModel()
+    model.compile(loss="mse", optimizer=tf.keras.optimizers.legacy.Adam(), jit_compile=jit_compile)
+    model.build(input_shape=[(None, None, 2), (None, None, 4)])  # init model weights
+    model.setTeacherForcing(teacher_forcing)
+    return model
+
+
+# READ DATA --------------------------------------------------------------------
+@benchmark("contour_history_load")
+def contour_history_load(scale: int):
+    temp_dir = tempfile.TemporaryDirectory()
+    hist_file = os.path.join(temp_dir.name, "control_points.hist")
+    write_synthetic_hist(hist_file, NUM_FRAMES * scale, NUM_CONTROL_POINTS * scale)
+
+    def load():
+        temp_dir  # keeps the directory alive as long as the benchmark
+        return ContourHistory(hist_file)
+
+    return load
+
+
+@benchmark("contour_history_reconstruct")
+def contour_history_reconstruct(scale: int):
+    temp_dir = tempfile.TemporaryDirectory()
+    hist_file = os.path.join(temp_dir.name, "control_points.hist")
+    write_synthetic_hist(hist_file, NUM_FRAMES * scale, NUM_CONTROL_POINTS * scale)
+    history = ContourHistory(hist_file)
+    temp_dir.cleanup()
+
+    def reconstruct():
+        history.clear_cache()  # measure the reconstruction, not the cache
+        return history.reconstruct_contour(0)
+
+    return reconstruct
+
+
+# DATASET CREATION -------------------------------------------------------------
+@benchmark("create_dataset")
+def create_dataset_benchmark(scale: int):
+    polygons, finger_positions, finger_forces = get_recording(scale)
+    return lambda: create_dataset(polygons, finger_positions, finger_forces)
+
+
+@benchmark("create_calculated_values_dataset")
+def create_calculated_values_dataset_benchmark(scale: int):
+    polygons, finger_positions, finger_forces = get_recording(scale)
+    return lambda: create_calculated_values_dataset(polygons, finger_positions, finger_forces)
+
+
+@benchmark("normalize_polygons")
+def normalize_polygons_benchmark(scale: int):
+    polygons = get_recording(scale)[0]
+    return lambda: normalize_polygons(polygons)
+
+
+# MODEL ------------------------------------------------------------------------
+FUSED_EPOCHS: int = 10  # epochs per call of the fused trainer
+
+
+def train_step(scale: int, jit_compile: bool):
+    from utils.xla import supports_xla
+
+    X_control_points, X_finger, Y = get_model_dataset(scale, NUM_FRAMES * scale)
+    model = get_model(teacher_forcing=True)
+    if jit_compile:
+        if not supports_xla(model, [X_control_points, X_finger], Y):
+            raise BenchmarkSkipped("XLA cannot compile the model")
+        model.jit_compile = True
+    return lambda: model.train_on_batch([X_control_points, X_finger], Y)
+
+
+def fused_epochs(scale: int, jit_compile: bool):
+    import tensorflow as tf
+    from utils.fused_trainer import FusedTrainer
+
+    X_control_points, X_finger, Y = get_model_dataset(scale, NUM_FRAMES * scale)
+    trainer = FusedTrainer(get_model(teacher_forcing=True), jit_compile=jit_compile)
+    run_epochs = trainer._build_run_epochs((X_control_points, X_finger), Y, None)
+    num_epochs = tf.constant(FUSED_EPOCHS)
+    run_epochs(num_epochs)
+    if jit_compile and not run_epochs.use_xla:
+        raise BenchmarkSkipped("XLA cannot compile the model")
+    return lambda: run_epochs(num_epochs)
+
+
+def rollout(scale: int, jit_compile: bool):
+    from utils.xla import make_predict_function
+
+    X_control_points, X_finger, _ = get_model_dataset(scale, NUM_FRAMES)
+    predict = make_predict_function(get_model(teacher_forcing=False), jit_compile)
+    initial_control_points = X_control_points[:, :1, :]
+    predict(initial_control_points, X_finger)
+    if jit_compile and not predict.use_xla:
+        raise BenchmarkSkipped("XLA cannot compile the model")
+    return lambda: predict(initial_control_points, X_finger).numpy()
+
+
+@benchmark("train_step_teacher_forcing")
+def train_step_teacher_forcing(scale: int):
+    return train_step(scale, jit_compile=False)
+
+
+@benchmark("train_step_teacher_forcing_xla")
+def train_step_teacher_forcing_xla(scale: int):
+    return train_step(scale, jit_compile=True)
+
+
+@benchmark(f"fused_{FUSED_EPOCHS}_epochs_teacher_forcing")
+def fused_epochs_teacher_forcing(scale: int):
+    return fused_epochs(scale, jit_compile=False)
+
+
+@benchmark(f"fused_{FUSED_EPOCHS}_epochs_teacher_forcing_xla")
+def fused_epochs_teacher_forcing_xla(scale: int):
+    return fused_epochs(scale, jit_compile=True)
+
+
+@benchmark("rollout_no_teacher_forcing")
+def rollout_no_teacher_forcing(scale: int):
+    return rollout(scale, jit_compile=False)
+
+
+@benchmark("rollout_no_teacher_forcing_xla")
+def rollout_no_teacher_forcing_xla(scale: int):
+    return rollout(scale, jit_compile=True)
+
+
+# PLOTS ------------------------------------------------------------------------
+@benchmark("render_gif_frame")
+def render_gif_frame(scale: int):
+    """One frame of generate_gif/prediction_gif_final_model.py, rendered to memory."""
+    try:
+        from concave_hull import concave_hull_indexes
+    except ImportError:
+        raise BenchmarkSkipped("concave_hull is not installed")
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    polygons = synthetic_polygons(NUM_FRAMES, NUM_CONTROL_POINTS * scale).swapaxes(0, 1)
+    finger_positions = synthetic_finger(NUM_FRAMES)[0]
+    img = np.random.default_rng(0).integers(0, 255, IMAGE_SHAPE, dtype=np.uint8)
+    frame_number = NUM_FRAMES // 2
+
+    def render():
+        concave_hull = list(concave_hull_indexes(polygons[:, 0, :], length_threshold=0.05,))
+        concave_hull.append(concave_hull[0])
+        frame_points = polygons[:, frame_number, :].take(concave_hull, axis=0)
+
+        plt.suptitle(f"Predicción {frame_number + 1}")
+        plt.imshow(img)
+        plt.scatter(finger_positions[frame_number, 0], finger_positions[frame_number, 1], color='lime', s=100)
+        plt.scatter(frame_points[:, 0], frame_points[:, 1], color='cyan', s=30)
+        plt.plot(frame_points[:, 0], frame_points[:, 1], color='cyan')
+        plt.xlim([370, 870])
+        plt.ylim([120, 670])
+        plt.gca().invert_yaxis()
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format="png")
+        plt.clf()
+        return buffer
+
+    return render
@@ -0,0 +1,52 @@
+"""
+    Synthetic recordings with the layout of the real ones, so the benchmarks can scale
+    the number of control points and frames beyond the 47 x 100 of the dataset.
+"""
+
+import numpy as np
+
+NUM_CONTROL_POINTS: int = 47
+NUM_FRAMES: int = 100
+IMAGE_SHAPE: tuple[int, int, int] = (964, 1288, 3)  # height, width and channels of the video frames
+CENTER: tuple[float, float] = (620.0, 500.0)
+RADIUS: float = 200.0
+
+
+def synthetic_polygons(num_frames: int, num_points: int, seed: int = 0) -> np.ndarray:
+    """
+    A circle of control points that is pushed in from one side, shape: (frames, points, 2).
+    """
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, num_points, endpoint=False)
+    depth = np.linspace(0, 0.3, num_frames)[:, np.newaxis]
+    radius = RADIUS * (1 - depth * np.clip(np.cos(angles), 0, None) ** 4)
+    polygons = np.stack(
+        (CENTER[0] + radius * np.cos(angles), CENTER[1] + radius * np.sin(angles)), axis=2
+    )
+    return polygons + rng.normal(0, 0.5, polygons.shape)
+
+
+def synthetic_finger(num_frames: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finger positions, shape: (frames, 2), and forces, shape: (frames,), of the push of synthetic_polygons.
+    """
+    depth = np.linspace(0, 0.3, num_frames)
+    positions = np.stack((CENTER[0] + RADIUS * (1 - depth), np.full(num_frames, CENTER[1])), axis=1)
+    forces = -0.1 - 2 * depth
+    return positions, forces
+
+
+def write_synthetic_hist(file_name: str, num_frames: int, num_points: int):
+    """
+    Writes a .hist file with a ring of num_points control points alive during num_frames.
+    """
+    polygons = np.rint(synthetic_polygons(num_frames, num_points)).astype(int)
+    with open(file_name, "w") as hist_file:
+        hist_file.write('Id\t"Birth time"\t"Death time"\t"Control points [x y prev next]+"\n')
+        for ident in range(num_points):
+            prev_ident = (ident - 1) % num_points
+            next_ident = (ident + 1) % num_points
+            history = " ".join(
+                f"[{x} {y} {prev_ident} {next_ident}]" for x, y in polygons[:, ident].tolist()
+            )
+            hist_file.write(f"{ident}\t0\t-1\t[{history}]\n")
@@ -15,13 +15,17 @@ import keras_tuner
 from subclassing_models import DeformationTrackerBiFlowModel as DeformationTrackerModel
 from utils.model_updater import save_best_model
 from utils.script_arguments import get_script_args
+from utils.dtype_policy import set_precision
+from utils.timing_callback import TimingCallback
+from utils.profiler_callback import ProfilerCallback
 from utils.weight_plot_callback import PlotWeightsCallback
-from dataset import create_datasets
+from dataset import load_datasets
 
 np.random.seed(42)
 tf.random.set_seed(42)
 
 script_args = get_script_args()
+set_precision(script_args.precision)  # before the models are created
 
 TRAIN_DATA_DIR: str = "data/sponge_centre"
 VALIDATION_DATA_DIR: str = "data/sponge_longside"
@@ -33,7 +37,7 @@ SHOULD_TRAIN_MODEL: bool = script_args.train
 RANDOM_SEARCH_TRIALS = 120
 TRAINING_EPOCHS = 12000
 
-train_dataset, validation_dataset = create_datasets()
+train_dataset, validation_dataset = load_datasets(align_forces=script_args.align_forces)
 
 # SETUP TENSORBOARD LOGS -------------------------------------------------------
 tensorboard_cb = keras.callbacks.TensorBoard(
@@ -41,6 +45,10 @@ tensorboard_cb = keras.callbacks.TensorBoard(
     histogram_freq=100,
     write_graph=True
 )
+# TIMING LOGS
+timing_cb = TimingCallback(LOGS_DIR, num_samples=train_dataset['Y'].shape[0])
+# PROFILING, only with --profile START END
+profiler_cb = ProfilerCallback(LOGS_DIR, script_args.profile)
 # EARLY STOPPING
 early_stopping_cb = keras.callbacks.EarlyStopping(patience=20, min_delta=0.0001)
 
@@ -88,7 +96,7 @@ tuner.search(
         validation_dataset['Y'],
     ),
     epochs=TRAINING_EPOCHS,
-    callbacks=[tensorboard_cb,] #checkpoint_train_cb, checkpoint_valid_cb],
+    callbacks=[tensorboard_cb, timing_cb, profiler_cb] #checkpoint_train_cb, checkpoint_valid_cb],
 )
 models = tuner.get_best_models(num_models=2)
 best_model = models[0]
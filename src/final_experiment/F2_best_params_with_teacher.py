@@ -14,27 +14,35 @@ from tensorflow import keras
 from subclassing_models import DeformationTrackerBiFlowModel as DeformationTrackerModel
 from utils.model_updater import save_best_model
 from utils.script_arguments import get_script_args
+from utils.dtype_policy import set_precision
+from utils.timing_callback import TimingCallback
+from utils.profiler_callback import ProfilerCallback
+from utils.fused_trainer import FusedTrainer
+from utils.checkpoint_manager import CheckpointManager
+from utils.xla import enable_xla
 from utils.weight_plot_callback import PlotWeightsCallback
-from dataset import create_datasets
+from dataset import load_datasets
 import plots.dataset_plotter as plotter
 
 np.random.seed(42)
 tf.random.set_seed(42)
 
 script_args = get_script_args()
+set_precision(script_args.precision)  # before the models are created
 
 TRAIN_DATA_DIR: str = "data/sponge_centre"
 VALIDATION_DATA_DIR: str = "data/sponge_longside"
 MODEL_NAME: str = "best_params_with_teacher"
 SAVED_MODEL_DIR: str = f"src/final_experiment/saved_models/best_{MODEL_NAME}"
 CHECKPOINT_MODEL_DIR: str = f"{SAVED_MODEL_DIR}/checkpoint/"
+TRAINING_CHECKPOINT_DIR: str = f"{SAVED_MODEL_DIR}/training_checkpoints/"  # to resume the training
 TRIAL_NAME = time.strftime("experiment_%Y_%m_%d-%H_%M_%S")
 LOGS_DIR = f"src/final_experiment/logs/{MODEL_NAME}/{TRIAL_NAME}"
 SHOULD_TRAIN_MODEL: bool = script_args.train
 TRAINING_EPOCHS = 12000
 
 
-train_dataset, validation_dataset = create_datasets()
+train_dataset, validation_dataset = load_datasets(align_forces=script_args.align_forces)
 
 # SETUP TENSORBOARD LOGS -------------------------------------------------------
 tensorboard_cb = keras.callbacks.TensorBoard(
@@ -42,6 +50,10 @@ tensorboard_cb = keras.callbacks.TensorBoard(
     histogram_freq=100,
     write_graph=True
 )
+# TIMING LOGS
+timing_cb = TimingCallback(LOGS_DIR, num_samples=train_dataset['Y'].shape[0])
+# PROFILING, only with --profile START END
+profiler_cb = ProfilerCallback(LOGS_DIR, script_args.profile)
 # EARLY STOPPING
 early_stopping_cb = keras.callbacks.EarlyStopping(patience=20, min_delta=0.0001)
 
@@ -53,6 +65,8 @@ checkpoint_cb = keras.callbacks.ModelCheckpoint(
     mode="min",
     save_best_only=True,
 )
+# RESUME CALLBACK, checkpoints of the model, the optimizer and the epoch
+checkpoint_manager_cb = CheckpointManager(TRAINING_CHECKPOINT_DIR)
 
 
 # CREATE MODEL
@@ -67,8 +81,13 @@ model.compile(
     ),
     loss="mse",
 )
+initial_epoch = checkpoint_manager_cb.restore(model) if script_args.resume else 0
 
-history = model.fit(
+if script_args.xla and not script_args.fused:
+    enable_xla(model, [train_dataset['X_control_points'], train_dataset['X_finger']], train_dataset['Y'])
+# with --fused the training set is a single batch and many epochs run per tf.function call
+fit = FusedTrainer(model, jit_compile=script_args.xla).fit if script_args.fused else model.fit
+history = fit(
     [train_dataset['X_control_points'], train_dataset['X_finger']],
     train_dataset['Y'],
     epochs=TRAINING_EPOCHS,
@@ -76,7 +95,8 @@ history = model.fit(
         [validation_dataset['X_control_points'], validation_dataset['X_finger']],
         validation_dataset['Y'],
     ),
-    callbacks=[tensorboard_cb, checkpoint_cb]
+    initial_epoch=initial_epoch,
+    callbacks=[tensorboard_cb, timing_cb, profiler_cb, checkpoint_cb, checkpoint_manager_cb]
 )
 
 save_best_model(
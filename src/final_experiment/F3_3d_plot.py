@@ -16,14 +16,14 @@ os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
 import time
 import tensorflow as tf
 tf.get_logger().setLevel('ERROR')
-from tensorflow import keras
 from concave_hull import concave_hull_indexes
 
 
 from utils.script_arguments import get_script_args
-from dataset import create_datasets
+from dataset import load_datasets
 import plots.dataset_plotter as plotter
 from subclassing_models import DeformationTrackerBiFlowModel as DeformationTrackerModel
+from utils.model_factory import get_model_factory
 
 
 STORED_MODEL_DIR: str = "src/final_experiment/saved_models/best_best_params_with_teacher_BEST"
@@ -32,46 +32,22 @@ CHECKPOINT_MODEL_DIR: str = f"{STORED_MODEL_DIR}/checkpoint/"
 
 
 if __name__ == "__main__":
-    train_dataset, validation_dataset = create_datasets()
+    train_dataset, validation_dataset = load_datasets()
 
-    model = DeformationTrackerModel()
-
-    # print(model.summary())
-
-    model.compile(loss="mse", optimizer="adam")
-    model.setTeacherForcing(False)
-
-    # try:
-    prev_model = keras.models.load_model(
-        STORED_MODEL_DIR,
-        custom_objects={"DeformationTrackerModel": DeformationTrackerModel},
-    )
-
-    model.setTeacherForcing(True)
-    model.build(input_shape=[(None, 100, 2), (None, 100, 4)])  # init model weights
-    model.set_weights(prev_model.get_weights())  # to use last model
-    #model.load_weights(CHECKPOINT_MODEL_DIR)  # to use checkpoint
-    print("Using stored model.")
+    factory = get_model_factory(DeformationTrackerModel)  # built and traced once per mode
+    factory.load_weights(STORED_MODEL_DIR)
 
     # EVALUACION --------------------------------------------------------------------
 
     print("EVALUACION SIN FORZAMIENTO:")
-    model.setTeacherForcing(False)
-    train_loss = model.evaluate(
-        [train_dataset['X_control_points'][:,:1,:], train_dataset['X_finger']],
-        train_dataset['Y']
-    )
+    train_loss = factory.evaluate(train_dataset['X_control_points'], train_dataset['X_finger'], train_dataset['Y'])
     print(f"Stored model loss on training set: {train_loss}")
-    validation_loss = model.evaluate(
-        [validation_dataset['X_control_points'][:,:1,:], validation_dataset['X_finger']],
-        validation_dataset['Y']
-    )
+    validation_loss = factory.evaluate(validation_dataset['X_control_points'], validation_dataset['X_finger'], validation_dataset['Y'])
     print(f"Stored model loss on validation set: {validation_loss}")
 
 
 
     # PREDICTION -------------------------------------------------------------------
-    model.setTeacherForcing(False)
 
     finger_position_plot = lambda positions: lambda ax: ax.scatter(
         range(100), positions[:, 0], positions[:, 1]*-1, s=10
@@ -82,7 +58,7 @@ if __name__ == "__main__":
     finger_data = validation_dataset['X_finger'][1,:,:2]
 
 
-    y_pred = model.predict([validation_dataset['X_control_points'][:,:1,:], validation_dataset['X_finger']])
+    y_pred = factory.predict(validation_dataset['X_control_points'], validation_dataset['X_finger'])
 
 
     predicted_polygons = y_pred.swapaxes(0, 1)
@@ -99,7 +75,7 @@ if __name__ == "__main__":
     # MULTIPLE PREDICTION TRAINING SET
     finger_data = train_dataset['X_finger'][1,:,:2]
 
-    y_pred = model.predict([train_dataset['X_control_points'][:47,:1,:], train_dataset['X_finger'][:47,:,:]])
+    y_pred = factory.predict(train_dataset['X_control_points'][:47], train_dataset['X_finger'][:47])
 
 
     predicted_polygons = y_pred.swapaxes(0, 1)
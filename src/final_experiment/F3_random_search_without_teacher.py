@@ -17,11 +17,16 @@ import keras_tuner
 from subclassing_models import DeformationTrackerBiFlowModel as DeformationTrackerModel
 from utils.model_updater import save_best_model
 from utils.script_arguments import get_script_args
+from utils.dtype_policy import set_precision
+from utils.timing_callback import TimingCallback
+from utils.profiler_callback import ProfilerCallback
+from utils.checkpoint_manager import warm_start
 from utils.weight_plot_callback import PlotWeightsCallback
 import plots.dataset_plotter as plotter
-from dataset import create_datasets
+from dataset import load_datasets
 
 script_args = get_script_args()
+set_precision(script_args.precision)  # before the models are created
 
 TRAIN_DATA_DIR: str = "data/sponge_centre"
 VALIDATION_DATA_DIR: str = "data/sponge_longside"
@@ -39,7 +44,7 @@ PREV_CHECKPOINT_MODEL_DIR: str = f"{PREV_MODEL_DIR}/checkpoint/"
 RANDOM_SEARCH_TRIALS = 30
 TRAINING_EPOCHS = 18000
 
-train_dataset, validation_dataset = create_datasets()
+train_dataset, validation_dataset = load_datasets(align_forces=script_args.align_forces)
 
 # SETUP TENSORBOARD LOGS -------------------------------------------------------
 tensorboard_cb = keras.callbacks.TensorBoard(
@@ -47,22 +52,12 @@ tensorboard_cb = keras.callbacks.TensorBoard(
     histogram_freq=100,
     write_graph=True
 )
+# TIMING LOGS
+timing_cb = TimingCallback(LOGS_DIR, num_samples=train_dataset['Y'].shape[0])
+# PROFILING, only with --profile START END
+profiler_cb = ProfilerCallback(LOGS_DIR, script_args.profile)
 
 # SETUP RANDOM SEARCH ----------------------------------------------------------------------------
-def load_weights(model):
-    """Loads the weights of the training with teacher."""
-    prev_model = keras.models.load_model(
-        PREV_MODEL_DIR,
-        custom_objects={"DeformationTrackerModel": DeformationTrackerModel},
-    )
-
-    model.build(input_shape=[(None, None, 2), (None, None, 4)])  # init model weights
-    # model.set_weights(prev_model.get_weights()) # to use last model
-    model.load_weights(PREV_CHECKPOINT_MODEL_DIR)  # to use checkpoint
-
-    return model
-
-
 def build_model(hp):
     model = DeformationTrackerModel(log_dir=LOGS_DIR)
     learning_rate = hp.Float("lr", min_value=0.005, max_value=0.01, sampling="log")
@@ -74,10 +69,10 @@ def build_model(hp):
         ),
         loss="mse",
     )
-    loaded_model = load_weights(model)
-    loaded_model.setTeacherForcing(False)
+    warm_start(model, PREV_CHECKPOINT_MODEL_DIR)  # weights of the training with teacher
+    model.setTeacherForcing(False)
 
-    return loaded_model
+    return model
 
 # RUN RANDOM SEARCH ----------------------------------------------------------------------
 tuner = keras_tuner.RandomSearch(
@@ -99,7 +94,7 @@ tuner.search(
         validation_dataset['Y'],
     ),
     epochs=TRAINING_EPOCHS,
-    callbacks=[tensorboard_cb,] #checkpoint_train_cb, checkpoint_valid_cb],
+    callbacks=[tensorboard_cb, timing_cb, profiler_cb] #checkpoint_train_cb, checkpoint_valid_cb],
 )
 models = tuner.get_best_models(num_models=2)
 best_model = models[0]
@@ -17,12 +17,20 @@ from tensorflow import keras
 from subclassing_models import DeformationTrackerBiFlowModel as DeformationTrackerModel
 from utils.model_updater import save_best_model
 from utils.script_arguments import get_script_args
+from utils.dtype_policy import set_precision
+from utils.timing_callback import TimingCallback
+from utils.profiler_callback import ProfilerCallback
+from utils.fused_trainer import FusedTrainer
+from utils.curriculum_trainer import CurriculumTrainer
+from utils.checkpoint_manager import CheckpointManager, warm_start
+from utils.xla import enable_xla
 from utils.weight_plot_callback import PlotWeightsCallback
 import plots.dataset_plotter as plotter
 import utils.logs as util_logs
-from dataset import create_datasets
+from dataset import load_datasets
 
 script_args = get_script_args()
+set_precision(script_args.precision)  # before the models are created
 
 TRAIN_DATA_DIR: str = "data/sponge_centre"
 VALIDATION_DATA_DIR: str = "data/sponge_longside"
@@ -30,6 +38,7 @@ VALIDATION_DATA_DIR: str = "data/sponge_longside"
 MODEL_NAME: str = "best_params_without_teacher"
 SAVED_MODEL_DIR: str = f"src/final_experiment/saved_models/best_{MODEL_NAME}"
 CHECKPOINT_MODEL_DIR: str = f"{SAVED_MODEL_DIR}/checkpoint/"
+TRAINING_CHECKPOINT_DIR: str = f"{SAVED_MODEL_DIR}/training_checkpoints/"  # to resume the training
 TRIAL_NAME = time.strftime("experiment_%Y_%m_%d-%H_%M_%S")
 LOGS_DIR = f"src/final_experiment/logs/{MODEL_NAME}/{TRIAL_NAME}"
 
@@ -38,7 +47,7 @@ PREV_MODEL_DIR: str = "src/final_experiment/saved_models/best_best_params_with_t
 PREV_CHECKPOINT_MODEL_DIR: str = f"{PREV_MODEL_DIR}/checkpoint/"
 TRAINING_EPOCHS = 4000
 
-train_dataset, validation_dataset = create_datasets()
+train_dataset, validation_dataset = load_datasets(align_forces=script_args.align_forces)
 
 # SETUP TENSORBOARD LOGS -------------------------------------------------------
 tensorboard_cb = keras.callbacks.TensorBoard(
@@ -46,6 +55,10 @@ tensorboard_cb = keras.callbacks.TensorBoard(
     histogram_freq=100,
     write_graph=True
 )
+# TIMING LOGS
+timing_cb = TimingCallback(LOGS_DIR, num_samples=train_dataset['Y'].shape[0])
+# PROFILING, only with --profile START END
+profiler_cb = ProfilerCallback(LOGS_DIR, script_args.profile)
 
 # SAVE BEST CALLBACK ON TRAINING
 checkpoint_cb = keras.callbacks.ModelCheckpoint(
@@ -55,6 +68,8 @@ checkpoint_cb = keras.callbacks.ModelCheckpoint(
     mode="min",
     save_best_only=True,
 )
+# RESUME CALLBACK, checkpoints of the model, the optimizer and the epoch
+checkpoint_manager_cb = CheckpointManager(TRAINING_CHECKPOINT_DIR)
 
 # CREATE MODEL
 model = DeformationTrackerModel(log_dir=LOGS_DIR)
@@ -73,18 +88,18 @@ model.setTeacherForcing(False)
 
 
 # TRAIN ------------------------------------------------------------------------
-prev_model = keras.models.load_model(
-    PREV_MODEL_DIR,
-    custom_objects={"DeformationTrackerModel": DeformationTrackerModel},
-)
-
-model.build(input_shape=[(None, None, 2), (None, None, 4)])  # init model weights
-# model.set_weights(prev_model.get_weights()) # to use last model
-model.load_weights(PREV_CHECKPOINT_MODEL_DIR)  # to use checkpoint
-print("Using stored model.")
+initial_epoch = checkpoint_manager_cb.restore(model) if script_args.resume else 0
+if initial_epoch == 0:
+    warm_start(model, PREV_CHECKPOINT_MODEL_DIR)  # weights of the training with teacher
 
 model.setTeacherForcing(False)
-history = model.fit(
+if script_args.xla and not (script_args.fused or script_args.curriculum):
+    enable_xla(model, [train_dataset['X_control_points'], train_dataset['X_finger']], train_dataset['Y'])
+# with --fused the training set is a single batch and many epochs run per tf.function call
+fit = FusedTrainer(model, jit_compile=script_args.xla).fit if script_args.fused else model.fit
+if script_args.curriculum:  # full batch too, on short windows of the rollout first
+    fit = CurriculumTrainer(model, jit_compile=script_args.xla).fit
+history = fit(
     [train_dataset['X_control_points'], train_dataset['X_finger']],
     train_dataset['Y'],
     validation_data=(
@@ -92,7 +107,8 @@ history = model.fit(
         validation_dataset['Y'],
     ),
     epochs=TRAINING_EPOCHS,
-    callbacks=[tensorboard_cb, checkpoint_cb] #, PlotWeightsCallback(plot_freq=50)],
+    initial_epoch=initial_epoch,
+    callbacks=[tensorboard_cb, timing_cb, profiler_cb, checkpoint_cb, checkpoint_manager_cb] #, PlotWeightsCallback(plot_freq=50)],
 )
 
 save_best_model(
@@ -1,55 +1,101 @@
 """
     Function to create the training and validation dataset.
+
+    The datasets can also be compiled into a single .npz bundle with:
+        python src/final_experiment/dataset.py
+    load_datasets() and load_test_dataset() read that bundle and rebuild it when any source file changes.
+    With --align-forces, or align_forces=True, the forces are resampled onto the video frames by
+    read_data/force_alignment.py instead of taking one row of the force file per frame.
 """
 
+import argparse
 import os
 import numpy as np
 import sys
 sys.path.append('./src')
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
 
-from read_data.finger_force_reader import read_finger_forces_file
+from read_data.finger_force_reader import read_finger_forces_file, FORCE_AXES
+from read_data.force_alignment import align_finger_forces_file
 from read_data.finger_position_reader import read_finger_positions_file
+import read_data.finger_force_reader as finger_force_reader
+import read_data.finger_position_reader as finger_position_reader
+import read_data.force_alignment as force_alignment
+import read_data.text_columns_reader as text_columns_reader
 from utils.dataset_creation import create_calculated_values_dataset, mirror_data_x_axis
 import plots.dataset_plotter as plotter
 import utils.normalization as normalization
+import utils.dataset_creation as dataset_creation
+import utils.dataset_cache as dataset_cache
+import utils.dtype_policy as dtype_policy
 
 TRAIN_DATA_DIR: str = "data/sponge_centre"
 VALIDATION_DATA_DIR: str = "data/sponge_longside"
 TEST_DATA_DIR: str = "data/sponge_shortside"
+NUM_FRAMES: int = 100  # every recording has one force and one finger position row per video frame
+
+DATASET_BUNDLE_FILE: str = "data/dataset_bundle.npz"
+ALIGNED_DATASET_BUNDLE_FILE: str = "data/dataset_bundle_aligned.npz"  # forces resampled onto the frames
+DATA_DIRS: dict[str, str] = {
+    "train": TRAIN_DATA_DIR,
+    "validation": VALIDATION_DATA_DIR,
+    "test": TEST_DATA_DIR,
+}
+SOURCE_FILE_NAMES: tuple[str, ...] = (
+    "finger_force.txt",
+    "finger_position.txt",
+    "fixed_control_points.npy",
+)
+# changes on the code that builds the datasets also invalidate the bundle
+BUILDER_FILES: tuple[str, ...] = (
+    __file__,
+    normalization.__file__,
+    dataset_creation.__file__,
+    finger_force_reader.__file__,
+    finger_position_reader.__file__,
+    force_alignment.__file__,
+    text_columns_reader.__file__,
+    dtype_policy.__file__,
+)
+
+def read_forces(data_dir: str, align_forces: bool = False) -> np.ndarray:
+    """
+        Returns the Fz force of every video frame of the recording in data_dir,
+        resampled from the timestamps of the sensor if align_forces is True
+    """
+    force_file: str = os.path.join(data_dir, "finger_force.txt")
+    if align_forces:
+        return align_finger_forces_file(force_file, NUM_FRAMES)[:, FORCE_AXES.index("fz")]
+    return read_finger_forces_file(force_file, expected_rows=NUM_FRAMES)
 
-def create_datasets():
+
+def create_datasets(align_forces: bool = False):
     """
         Returns training and validation datasets
     """
     # READ FORCE FILE --------------------------------------------------------------
-    train_finger_force_file: str = os.path.join(TRAIN_DATA_DIR, "finger_force.txt")
-    train_forces: np.ndarray = read_finger_forces_file(train_finger_force_file)
-
-    validation_finger_force_file: str = os.path.join(
-        VALIDATION_DATA_DIR, "finger_force.txt"
-    )
-    validation_forces: np.ndarray = read_finger_forces_file(validation_finger_force_file)
+    train_forces: np.ndarray = read_forces(TRAIN_DATA_DIR, align_forces)
+    validation_forces: np.ndarray = read_forces(VALIDATION_DATA_DIR, align_forces)
 
     # READ FINGER POSITION FILE ----------------------------------------------------
     train_finger_positions_file: str = os.path.join(TRAIN_DATA_DIR, "finger_position.txt")
     train_finger_positions: np.ndarray = read_finger_positions_file(
-        train_finger_positions_file
+        train_finger_positions_file, expected_rows=NUM_FRAMES
     )
 
     valid_finger_positions_file: str = os.path.join(
         VALIDATION_DATA_DIR, "finger_position.txt"
     )
     validation_finger_positions: np.ndarray = read_finger_positions_file(
-        valid_finger_positions_file
+        valid_finger_positions_file, expected_rows=NUM_FRAMES
     )
 
     # READ CONTROL POINTS ----------------------------------------------------------
     train_cp_file: str = os.path.join(TRAIN_DATA_DIR, "fixed_control_points.npy")
-    train_polygons = np.flip(np.load(train_cp_file), axis=0)
+    train_polygons = np.flip(np.load(train_cp_file), axis=0).astype(dtype_policy.FLOAT_DTYPE)
 
     valid_cp_file: str = os.path.join(VALIDATION_DATA_DIR, "fixed_control_points.npy")
-    validation_polygons = np.flip(np.load(valid_cp_file),axis=0)
+    validation_polygons = np.flip(np.load(valid_cp_file),axis=0).astype(dtype_policy.FLOAT_DTYPE)
 
 
     # NORMALIZATION ----------------------------------------------------------------
@@ -127,23 +173,22 @@ def create_datasets():
 
     return train_dataset, validation_dataset
 
-def create_test_dataset():
+def create_test_dataset(align_forces: bool = False):
     """
         Returns training and validation datasets
     """
     # READ FORCE FILE --------------------------------------------------------------
-    test_finger_force_file: str = os.path.join(TEST_DATA_DIR, "finger_force.txt")
-    test_forces: np.ndarray = read_finger_forces_file(test_finger_force_file)
+    test_forces: np.ndarray = read_forces(TEST_DATA_DIR, align_forces)
 
     # READ FINGER POSITION FILE ----------------------------------------------------
     test_finger_positions_file: str = os.path.join(TEST_DATA_DIR, "finger_position.txt")
     test_finger_positions: np.ndarray = read_finger_positions_file(
-        test_finger_positions_file
+        test_finger_positions_file, expected_rows=NUM_FRAMES
     )
 
     # READ CONTROL POINTS ----------------------------------------------------------
     test_cp_file: str = os.path.join(TEST_DATA_DIR, "fixed_control_points.npy")
-    test_polygons = np.flip(np.load(test_cp_file),axis=0)
+    test_polygons = np.flip(np.load(test_cp_file),axis=0).astype(dtype_policy.FLOAT_DTYPE)
 
 
     # NORMALIZATION ----------------------------------------------------------------
@@ -167,4 +212,128 @@ def create_test_dataset():
     )
     test_dataset['finger_position'] = norm_test_finger_positions
 
-    return test_dataset
\ No newline at end of file
+    return test_dataset
+
+
+def get_source_files() -> list[str]:
+    """
+        Returns the files the datasets are built from
+    """
+    data_files = [
+        os.path.join(data_dir, file_name)
+        for data_dir in DATA_DIRS.values()
+        for file_name in SOURCE_FILE_NAMES
+    ]
+    return data_files + list(BUILDER_FILES)
+
+
+def get_source_hash(align_forces: bool = False) -> str:
+    """
+        Returns the hash the bundle is tagged with, it also tells how the forces were read
+    """
+    source_hash = dataset_cache.hash_files(get_source_files())
+    return f"{source_hash}:aligned" if align_forces else source_hash
+
+
+def get_bundle_file(bundle_file: str = None, align_forces: bool = False) -> str:
+    """
+        Returns bundle_file, or the default bundle of the way the forces are read
+    """
+    if bundle_file is not None:
+        return bundle_file
+    return ALIGNED_DATASET_BUNDLE_FILE if align_forces else DATASET_BUNDLE_FILE
+
+
+def read_normalization_params(data_dir: str, align_forces: bool = False) -> dict[str, np.ndarray]:
+    """
+        Returns the parameters used to normalize the recording in data_dir
+    """
+    polygons = np.flip(np.load(os.path.join(data_dir, "fixed_control_points.npy")), axis=0).astype(dtype_policy.FLOAT_DTYPE)
+    forces = read_forces(data_dir, align_forces)
+    center, scale = normalization.get_normalization_params(polygons)
+    return {
+        "center": np.asarray(center),
+        "scale": np.asarray(scale),
+        "force_norm": np.asarray(np.min(forces)),
+    }
+
+
+def build_dataset_bundle(bundle_file: str = None, align_forces: bool = False) -> dict[str, np.ndarray]:
+    """
+        Builds every dataset and writes them, along with their normalization parameters, into bundle_file.
+        Returns the stored arrays.
+    """
+    bundle_file = get_bundle_file(bundle_file, align_forces)
+    source_hash = get_source_hash(align_forces)
+    train_dataset, validation_dataset = create_datasets(align_forces)
+    test_dataset = create_test_dataset(align_forces)
+
+    arrays = {}
+    for split, dataset in zip(DATA_DIRS, (train_dataset, validation_dataset, test_dataset)):
+        for key, array in dataset.items():
+            arrays[f"{split}_{key}"] = array
+    for split, data_dir in DATA_DIRS.items():
+        for key, value in read_normalization_params(data_dir, align_forces).items():
+            arrays[f"normalization_{split}_{key}"] = value
+
+    dataset_cache.save_bundle(bundle_file, arrays, source_hash)
+    return arrays
+
+
+def load_bundle_sections(bundle_file: str = None, align_forces: bool = False) -> dict[str, dict]:
+    """
+        Returns the bundle grouped by section (train, validation, test and normalization),
+        the bundle is rebuilt first if it is missing or stale.
+    """
+    bundle_file = get_bundle_file(bundle_file, align_forces)
+    arrays = dataset_cache.load_bundle(bundle_file, get_source_hash(align_forces))
+    if arrays is None:
+        print(f"Building dataset bundle: {bundle_file}")
+        arrays = build_dataset_bundle(bundle_file, align_forces)
+
+    sections: dict[str, dict] = {}
+    for key, array in arrays.items():
+        section, name = key.split("_", 1)
+        sections.setdefault(section, {})[name] = array
+    return sections
+
+
+def load_datasets(bundle_file: str = None, align_forces: bool = False):
+    """
+        Returns training and validation datasets from the compiled bundle.
+        Same output as create_datasets, every floating point array is float32.
+    """
+    sections = load_bundle_sections(bundle_file, align_forces)
+    dtype_policy.check_dataset(sections["train"], "training dataset")
+    dtype_policy.check_dataset(sections["validation"], "validation dataset")
+    return sections["train"], sections["validation"]
+
+
+def load_test_dataset(bundle_file: str = None, align_forces: bool = False):
+    """
+        Returns the test dataset from the compiled bundle.
+        Same output as create_test_dataset, every floating point array is float32.
+    """
+    test_dataset = load_bundle_sections(bundle_file, align_forces)["test"]
+    dtype_policy.check_dataset(test_dataset, "test dataset")
+    return test_dataset
+
+
+def load_normalization_params(bundle_file: str = None, align_forces: bool = False) -> dict[str, np.ndarray]:
+    """
+        Returns the normalization parameters of every recording, e.g. params["test_center"].
+    """
+    return load_bundle_sections(bundle_file, align_forces)["normalization"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compiles the datasets into a .npz bundle.")
+    parser.add_argument(
+        "--align-forces",
+        help="resample the forces onto the video frames with read_data/force_alignment.py",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    args = parser.parse_args()
+    arrays = build_dataset_bundle(align_forces=args.align_forces)
+    print(f"Dataset bundle saved in: {get_bundle_file(None, args.align_forces)} ({len(arrays)} arrays)")
@@ -0,0 +1,127 @@
+"""
+    Scores every stored model on the train, validation and test sets, with and without teacher forcing.
+
+    The datasets are loaded once and the weights are read straight from the checkpoints, so the stored
+    models are never deserialized. Models with the same architecture share the model of one ModelFactory
+    and its traced function per mode, only the weights are replaced between them.
+
+    Writes:
+        results.csv: one row per stored model, MSE of every split in both modes
+        step_errors.npz: MSE of every time step, shape: (models, splits, modes, steps)
+
+    usage:
+        python src/final_experiment/evaluate.py
+        python src/final_experiment/evaluate.py --roots saved_models_final --output-dir /tmp/evaluation
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append('./src')
+
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
+import tensorflow as tf
+tf.get_logger().setLevel('ERROR')
+
+from dataset import load_datasets, load_test_dataset
+from utils.model_factory import MODES, ModelFactory, get_model_factory
+from utils.stored_weights import find_stored_models, get_architecture, read_stored_weights
+
+STORED_MODEL_ROOTS: tuple[str, ...] = (
+    "saved_models",
+    "saved_models_final",
+    "src/final_experiment/saved_models",
+)
+OUTPUT_DIR: str = "src/final_experiment/evaluation"
+RESULTS_FILE_NAME: str = "results.csv"
+STEP_ERRORS_FILE_NAME: str = "step_errors.npz"
+
+SPLITS: tuple[str, ...] = ("train", "validation", "test")
+
+
+def get_step_errors(factory: ModelFactory, weights: list[np.ndarray], datasets: dict[str, dict]) -> np.ndarray:
+    """
+    Returns the MSE of every time step, shape: (splits, modes, steps).
+    The model gets the first factory.finger_width columns of the finger input, x, y and force for a width of 3.
+    """
+    factory.model.set_weights(weights)
+    errors = []
+    for split in SPLITS:
+        dataset = datasets[split]
+        X_finger = dataset["X_finger"][..., : factory.finger_width]
+        errors.append([
+            np.mean(
+                (factory.predict(dataset["X_control_points"], X_finger, mode == "teacher") - dataset["Y"]) ** 2,
+                axis=(0, 2),
+            )
+            for mode in MODES
+        ])
+    return np.array(errors)
+
+
+def evaluate_stored_models(roots: list[str], output_dir: str):
+    train_dataset, validation_dataset = load_datasets()
+    datasets = dict(zip(SPLITS, (train_dataset, validation_dataset, load_test_dataset())))
+    dataset_finger_width = datasets["train"]["X_finger"].shape[2]
+    num_steps = datasets["train"]["Y"].shape[1]
+
+    factories: set[ModelFactory] = set()
+    rows, names, curves = [], [], []
+    for name, prefix in find_stored_models(roots):
+        start_time = time.perf_counter()
+        try:
+            weights = read_stored_weights(prefix)
+            finger_width = weights[0].shape[0] - 2
+            if finger_width > dataset_finger_width:
+                model_class, status = None, f"finger input of width {finger_width}"
+            else:
+                model_class, status = get_architecture(weights, finger_width)
+        except Exception as error:
+            model_class, status = None, f"unreadable checkpoint: {type(error).__name__}"
+        row = {"model": name, "architecture": model_class.__name__ if model_class else "", "status": status}
+
+        if model_class is not None:
+            factory = get_model_factory(model_class, finger_width, num_steps)
+            factories.add(factory)
+            errors = get_step_errors(factory, weights, datasets)
+            for split_index, split in enumerate(SPLITS):
+                for mode_index, mode in enumerate(MODES):
+                    row[f"{split}_{mode}_mse"] = float(np.mean(errors[split_index, mode_index]))
+            names.append(name)
+            curves.append(errors)
+        rows.append(row)
+        print(f"{name}: {status} ({time.perf_counter() - start_time:.2f}s)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    fields = ["model", "architecture", "status"] + [f"{split}_{mode}_mse" for split in SPLITS for mode in MODES]
+    with open(os.path.join(output_dir, RESULTS_FILE_NAME), "w", newline="") as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    np.savez(
+        os.path.join(output_dir, STEP_ERRORS_FILE_NAME),
+        models=np.array(names),
+        splits=np.array(SPLITS),
+        modes=np.array(MODES),
+        errors=np.stack(curves) if curves else np.empty((0, len(SPLITS), len(MODES), num_steps)),
+    )
+    print(f"{len(names)} of {len(rows)} stored models evaluated, results in {output_dir}")
+    for factory in factories:
+        print(f"{factory.model_class.__name__} traces: {factory.get_tracing_counts()}")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--roots", nargs="+", default=list(STORED_MODEL_ROOTS), help="directories searched for stored models")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="directory of the results table and the step errors")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    evaluate_stored_models(args.roots, args.output_dir)
@@ -16,14 +16,14 @@ os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
 import time
 import tensorflow as tf
 tf.get_logger().setLevel('ERROR')
-from tensorflow import keras
 from concave_hull import concave_hull_indexes
 
 
 from utils.script_arguments import get_script_args
-from final_experiment.dataset import create_datasets, create_test_dataset
+from final_experiment.dataset import load_datasets, load_test_dataset
 import plots.dataset_plotter as plotter
 from subclassing_models import DeformationTrackerBiFlowModel as DeformationTrackerModel
+from utils.model_factory import get_model_factory
 
 
 STORED_MODEL_DIR: str = "src/final_experiment/saved_models/best_e2_rs"
@@ -31,32 +31,18 @@ CHECKPOINT_MODEL_DIR: str = f"{STORED_MODEL_DIR}/checkpoint/"
 
 
 if __name__ == "__main__":
-    train_dataset, validation_dataset = create_datasets()
-
-    model = DeformationTrackerModel()
-    model.compile(loss="mse", optimizer="adam")
-    model.setTeacherForcing(False)
+    train_dataset, validation_dataset = load_datasets()
 
     # LOAD MODEL -------------------------------------------------------------------
-    prev_model = keras.models.load_model(
-        STORED_MODEL_DIR,
-        custom_objects={"DeformationTrackerModel": DeformationTrackerModel},
-    )
-
-    model.setTeacherForcing(True)
-    model.build(input_shape=[(None, 100, 2), (None, 100, 4)])  # init model weights
-    model.set_weights(prev_model.get_weights())  # to use last model
-    #model.load_weights(CHECKPOINT_MODEL_DIR)  # to use checkpoint
-    print("Using stored model.")
-
-    model.setTeacherForcing(False)
+    factory = get_model_factory(DeformationTrackerModel)  # built and traced once per mode
+    factory.load_weights(STORED_MODEL_DIR)
 
     finger_position_plot = lambda positions: lambda ax: ax.scatter(
         range(100), positions[:, 0], positions[:, 1]*-1, s=10
     )
 
     # # PREDICTION TRINING SET -------------------------------------------------------------------
-    # y_pred = model.predict([train_dataset['X_control_points'][:47,:1,:], train_dataset['X_finger'][:47,:,:]])
+    # y_pred = factory.predict(train_dataset['X_control_points'][:47], train_dataset['X_finger'][:47])
     # for frame_number in range(100):
     #     scale = 200
     #     polygon_center = [623.30482589, 497.98404272]
@@ -98,7 +84,7 @@ if __name__ == "__main__":
 
 
     # PREDICTION VALIDATION SET -------------------------------------------------------------------
-    # y_pred = model.predict([validation_dataset['X_control_points'][:47,:1,:], validation_dataset['X_finger'][:47,:,:]])
+    # y_pred = factory.predict(validation_dataset['X_control_points'][:47], validation_dataset['X_finger'][:47])
     # for frame_number in range(100):
     #     scale = 200
     #     polygon_center = [508.94235277, 506.56720458] # normalization: means[0]
@@ -140,8 +126,8 @@ if __name__ == "__main__":
 
 
     # PREDICTION TEST SET -------------------------------------------------------------------
-    test_dataset = create_test_dataset()
-    y_pred = model.predict([test_dataset['X_control_points'][:47,:1,:], test_dataset['X_finger'][:47,:,:]])
+    test_dataset = load_test_dataset()
+    y_pred = factory.predict(test_dataset['X_control_points'][:47], test_dataset['X_finger'][:47])
     for frame_number in range(100):
         scale = 200
         polygon_center = [609.09286834, 427.11354844] # normalization: means[0]
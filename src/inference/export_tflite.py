@@ -0,0 +1,138 @@
+"""
+    Exports a stored model to TensorFlow Lite for the low latency inference next to the robot.
+
+    The .tflite file has two signatures:
+        step: one step without teacher forcing, (previous, initial, finger) -> next control points,
+            for the online loop where the finger position arrives one frame at a time
+        rollout: the whole rollout of the model without teacher forcing, unrolled over the steps,
+            (initial, finger) -> control points of every step
+    The finger input is x, y and force, the distance to the finger is computed from the previous control points.
+    The weights can be quantized to float16 or int8 (dynamic range quantization, the activations stay float32).
+
+    usage:
+        python src/inference/export_tflite.py
+        python src/inference/export_tflite.py saved_models/best_14_50n_biflow --quantization int8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.append('./src')
+
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
+import tensorflow as tf
+tf.get_logger().setLevel('ERROR')
+
+from subclassing_models import FINGER_FEATURES, DeformationTrackerBiFlowModel, distance_to_finger, uses_distance
+from utils.stored_weights import load_stored_model
+
+STORED_MODEL_DIR: str = "src/final_experiment/saved_models/best_e2_rs"  # FINAL MODEL
+EXPORT_DIR: str = "exported_models"
+QUANTIZATIONS: tuple[str, ...] = ("none", "float16", "int8")
+NUM_STEPS: int = 100  # fixed by the rollout of subclassing_models
+
+
+class ExportModule(tf.Module):
+    """
+    The signatures of the exported model, built on the layers of the keras model.
+    Only the layers are kept: the subclassed model cannot be saved without a traced call.
+    """
+
+    def __init__(self, model: tf.keras.Model):
+        super().__init__()
+        self.hidden1 = model.hidden1
+        self.hidden2 = model.hidden2
+        self.output_layer = model.output_layer
+        self.bi_flow = isinstance(model, DeformationTrackerBiFlowModel)
+        self.with_distance = uses_distance(model, FINGER_FEATURES)
+
+    def step(self, previous, initial, finger):
+        """
+        previous, initial: shape(batch, 2), finger: shape(batch, 3) -> shape(batch, 2)
+        """
+        return {"control_points": self._step(previous, initial, finger)}
+
+    def rollout(self, initial, finger):
+        """
+        initial: shape(batch, 2), finger: shape(batch, steps, 3) -> shape(batch, steps, 2)
+        """
+        control_points = initial
+        outputs = []
+        for step in range(NUM_STEPS):
+            control_points = self._step(control_points, initial, finger[:, step, :])
+            outputs.append(control_points)
+        return {"control_points": tf.stack(outputs, axis=1)}
+
+    def _step(self, previous, initial, finger):
+        """
+        The rollout runs every step as a sequence of length one, so both recurrent layers start from
+        a zero state. The cells are called directly, the recurrent layers would add a while loop
+        with tensor lists that the TFLite builtin ops cannot run.
+        """
+        if self.with_distance:
+            finger = tf.concat([finger, distance_to_finger(previous, finger[:, :2])], axis=-1)
+        layer_input = tf.concat([previous, finger], axis=-1)
+        zero_state = [tf.zeros([tf.shape(layer_input)[0], self.hidden1.units])]
+        hidden1, _ = self.hidden1.cell(layer_input, zero_state)
+        hidden2, _ = self.hidden2.cell(hidden1, zero_state)
+        if self.bi_flow:
+            hidden2 = tf.concat([initial, hidden2], axis=-1)
+        return self.output_layer(hidden2)
+
+
+def convert(model: tf.keras.Model, quantization: str = "none") -> bytes:
+    module = ExportModule(model)
+    step = tf.function(
+        module.step,
+        input_signature=[
+            tf.TensorSpec(shape=(None, 2), dtype=tf.float32, name="previous"),
+            tf.TensorSpec(shape=(None, 2), dtype=tf.float32, name="initial"),
+            tf.TensorSpec(shape=(None, FINGER_FEATURES), dtype=tf.float32, name="finger"),
+        ],
+    ).get_concrete_function()
+    rollout = tf.function(
+        module.rollout,
+        input_signature=[
+            tf.TensorSpec(shape=(None, 2), dtype=tf.float32, name="initial"),
+            tf.TensorSpec(shape=(None, NUM_STEPS, FINGER_FEATURES), dtype=tf.float32, name="finger"),
+        ],
+    ).get_concrete_function()
+
+    # the converter only keeps several signatures when it reads them from a SavedModel
+    with tempfile.TemporaryDirectory() as saved_model_dir:
+        tf.saved_model.save(module, saved_model_dir, signatures={"step": step, "rollout": rollout})
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir, signature_keys=["step", "rollout"])
+        if quantization != "none":
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        return converter.convert()
+
+
+def export_tflite(model_path: str, output_file: str, quantization: str = "none") -> str:
+    model = load_stored_model(model_path)
+    tflite_model = convert(model, quantization)
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    with open(output_file, "wb") as tflite_file:
+        tflite_file.write(tflite_model)
+    print(f"Exported {model_path} ({quantization} quantization, {len(tflite_model) / 1024:.1f} KiB) to {output_file}")
+    return output_file
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("model_path", nargs="?", default=STORED_MODEL_DIR, help="stored model to export")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default="none", help="quantization of the weights")
+    parser.add_argument(
+        "--output", default=None, help=f"output .tflite file, default: {EXPORT_DIR}/<model name>_<quantization>.tflite"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    model_name = os.path.basename(os.path.normpath(args.model_path))
+    output_file = args.output or os.path.join(EXPORT_DIR, f"{model_name}_{args.quantization}.tflite")
+    export_tflite(args.model_path, output_file, args.quantization)
@@ -0,0 +1,51 @@
+"""
+    Exports the weights of a stored model to a .npz file for inference/numpy_model.py.
+
+    The weights are read straight from the checkpoint, the model is not loaded. The model can be
+    a SavedModel directory, a keras-tuner trial, a ModelCheckpoint directory or a checkpoint prefix.
+
+    usage:
+        python src/inference/export_weights.py saved_models/best_14_50n_biflow
+        python src/inference/export_weights.py saved_models/best_14_50n --output /tmp/best_14_50n.npz
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append('./src')
+
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
+
+from inference.numpy_model import NumpyDeformationTracker, save_weights
+from utils.stored_weights import get_architecture, get_checkpoint_prefix, read_stored_weights
+
+EXPORT_DIR: str = "exported_models"
+
+
+def export_weights(model_path: str, output_file: str) -> NumpyDeformationTracker:
+    """
+    Writes the weights of the stored model to output_file and returns the NumPy model built from them.
+    """
+    weights = read_stored_weights(get_checkpoint_prefix(model_path))
+    model_class, status = get_architecture(weights, weights[0].shape[0] - 2)
+    if model_class is None:
+        raise Exception(f"{model_path} does not match a model of subclassing_models: {status}")
+    model = NumpyDeformationTracker(weights)
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    save_weights(output_file, weights)
+    print(f"Exported {model_class.__name__} (finger input of width {model.finger_width}) to {output_file}")
+    return model
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("model_path", help="stored model to export")
+    parser.add_argument("--output", default=None, help=f"output .npz file, default: {EXPORT_DIR}/<model name>.npz")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    model_name = os.path.basename(os.path.normpath(args.model_path))
+    export_weights(args.model_path, args.output or os.path.join(EXPORT_DIR, f"{model_name}.npz"))
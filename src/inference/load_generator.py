@@ -0,0 +1,99 @@
+"""
+    Load generator for inference/server.py.
+
+    Every client thread sends the validation recording, one request per polygon of --points control points,
+    and waits for the answer before sending the next one. Prints the latency seen by the clients
+    and the metrics of the server.
+
+    usage:
+        python src/inference/load_generator.py
+        python src/inference/load_generator.py --clients 16 --requests 50 --points 47
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+sys.path.append('./src')
+
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
+
+from final_experiment.dataset import load_datasets
+
+# same defaults as inference/server.py, which is not imported since it loads TensorFlow
+HOST: str = "127.0.0.1"
+PORT: int = 8500
+NUM_CLIENTS: int = 8
+NUM_REQUESTS: int = 20  # per client
+
+
+def post_json(url: str, content: dict) -> dict:
+    request = urllib.request.Request(
+        url, data=json.dumps(content).encode(), headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def get_json(url: str) -> dict:
+    with urllib.request.urlopen(url) as response:
+        return json.loads(response.read())
+
+
+def make_requests(dataset: dict, num_points: int) -> list[dict]:
+    """Splits the control points of the dataset into polygons of num_points."""
+    return [
+        {
+            "control_points": dataset["X_control_points"][start : start + num_points, 0].tolist(),
+            "finger": dataset["X_finger"][start, :, :3].tolist(),  # shared, the server computes the distance
+        }
+        for start in range(0, dataset["X_control_points"].shape[0], num_points)
+    ]
+
+
+def run_load(url: str, num_clients: int = NUM_CLIENTS, num_requests: int = NUM_REQUESTS, num_points: int = 47):
+    _, validation_dataset = load_datasets()
+    requests = make_requests(validation_dataset, num_points)
+    latencies = [[] for _ in range(num_clients)]
+
+    def client(index: int):
+        for request_index in range(num_requests):
+            start_time = time.perf_counter()
+            response = post_json(f"{url}/predict", requests[(index + request_index) % len(requests)])
+            latencies[index].append(time.perf_counter() - start_time)
+            assert len(response["control_points"]) == len(requests[(index + request_index) % len(requests)]["control_points"])
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(num_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    all_latencies = np.concatenate(latencies)
+    p50, p90, p99 = np.percentile(all_latencies, [50, 90, 99]) * 1e3
+    print(f"{len(all_latencies)} requests from {num_clients} clients in {elapsed:.2f}s: {len(all_latencies) / elapsed:.1f} requests/s")
+    print(f"Client latency: p50 {p50:.1f}ms, p90 {p90:.1f}ms, p99 {p99:.1f}ms")
+    print("Server metrics:")
+    print(json.dumps(get_json(f"{url}/metrics"), indent=2))
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--url", default=f"http://{HOST}:{PORT}", help="address of the server")
+    parser.add_argument("--clients", type=int, default=NUM_CLIENTS, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=NUM_REQUESTS, help="requests per client")
+    parser.add_argument("--points", type=int, default=47, help="control points per request")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    run_load(args.url, args.clients, args.requests, args.points)
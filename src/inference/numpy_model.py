@@ -0,0 +1,189 @@
+"""
+    Inference of the trained deformation models with NumPy only, TensorFlow is not imported.
+
+    The weights are read from the .npz written by inference/export_weights.py. Both model classes
+    of subclassing_models are supported, DeformationTrackerBiFlowModel feeds the control points
+    to the output layer too. All the control points are computed at once, as one batch.
+    Like the models, the distance to the finger is computed from the control points fed to every step,
+    so the finger data only needs x, y and force.
+"""
+
+import numpy as np
+
+FORMAT_VERSION: int = 1
+# names of the arrays in the .npz, in the order of model.get_weights()
+WEIGHT_NAMES: tuple[str, ...] = (
+    "hidden1_kernel",
+    "hidden1_recurrent_kernel",
+    "hidden1_bias",
+    "hidden2_kernel",
+    "hidden2_recurrent_kernel",
+    "hidden2_bias",
+    "output_kernel",
+    "output_bias",
+)
+CONTROL_POINT_WIDTH: int = 2  # x, y
+FINGER_FEATURES: int = 3  # x, y, force, the models with 4 finger features add the distance to the finger
+
+
+def save_weights(file_name: str, weights: list[np.ndarray]):
+    """Writes the weights, in the order of model.get_weights(), as float32 arrays."""
+    np.savez(
+        file_name,
+        format_version=np.array(FORMAT_VERSION),
+        **{name: np.asarray(array, dtype=np.float32) for name, array in zip(WEIGHT_NAMES, weights)},
+    )
+
+
+class NumpyDeformationTracker:
+    """
+    NumPy version of DeformationTrackerModel and DeformationTrackerBiFlowModel.
+    The hidden states are kept in buffers that are reused while the batch and the number of steps do not change.
+    """
+
+    def __init__(self, weights: list[np.ndarray], dtype=np.float32):
+        """
+        weights: in the order of model.get_weights()
+        """
+        (
+            hidden1_kernel,
+            self.hidden1_recurrent_kernel,
+            self.hidden1_bias,
+            self.hidden2_kernel,
+            self.hidden2_recurrent_kernel,
+            self.hidden2_bias,
+            output_kernel,
+            self.output_bias,
+        ) = [np.asarray(array, dtype=dtype) for array in weights]
+        self.dtype = dtype
+        self.hidden_units = self.hidden1_bias.shape[0]
+        self.finger_width = hidden1_kernel.shape[0] - CONTROL_POINT_WIDTH
+        if self.finger_width not in (FINGER_FEATURES, FINGER_FEATURES + 1):
+            raise Exception(f"The first layer has a finger input of width {self.finger_width}, expected 3 or 4.")
+
+        # the first layer gets concat(control points, finger), split so each part is multiplied on its own
+        self.hidden1_control_point_kernel = hidden1_kernel[:CONTROL_POINT_WIDTH]
+        self.hidden1_finger_kernel = hidden1_kernel[CONTROL_POINT_WIDTH : CONTROL_POINT_WIDTH + FINGER_FEATURES]
+        self.with_distance = self.finger_width == FINGER_FEATURES + 1
+        self.hidden1_distance_kernel = hidden1_kernel[-1] if self.with_distance else None
+        # DeformationTrackerBiFlowModel: the output layer gets concat(control points, hidden2)
+        self.bi_flow = output_kernel.shape[0] == self.hidden_units + CONTROL_POINT_WIDTH
+        if self.bi_flow:
+            self.output_control_point_kernel = output_kernel[:CONTROL_POINT_WIDTH]
+            self.output_hidden_kernel = output_kernel[CONTROL_POINT_WIDTH:]
+        elif output_kernel.shape[0] == self.hidden_units:
+            self.output_control_point_kernel = None
+            self.output_hidden_kernel = output_kernel
+        else:
+            raise Exception(f"The output layer has an input of width {output_kernel.shape[0]}.")
+
+        self._buffers: dict[tuple[int, int], tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def load(cls, file_name: str, dtype=np.float32) -> "NumpyDeformationTracker":
+        with np.load(file_name) as arrays:
+            if int(arrays["format_version"]) != FORMAT_VERSION:
+                raise Exception(f"{file_name} was exported with another version of the exporter.")
+            return cls([arrays[name] for name in WEIGHT_NAMES], dtype)
+
+    def _get_buffers(self, batch_size: int, num_steps: int) -> tuple[np.ndarray, np.ndarray]:
+        """Hidden states of both layers, shape: (batch, steps, hidden units)."""
+        key = (batch_size, num_steps)
+        if key not in self._buffers:
+            self._buffers.clear()  # only the last shape is kept
+            self._buffers[key] = (
+                np.empty((batch_size, num_steps, self.hidden_units), dtype=self.dtype),
+                np.empty((batch_size, num_steps, self.hidden_units), dtype=self.dtype),
+            )
+        return self._buffers[key]
+
+    def _run_rnn(self, projected_input: np.ndarray, recurrent_kernel: np.ndarray, states: np.ndarray):
+        """
+        SimpleRNN with tanh over projected_input = input @ kernel + bias, shape: (batch, steps, units).
+        The states are written into states, the initial state is zero.
+        """
+        np.tanh(projected_input[:, 0], out=states[:, 0])
+        for step in range(1, projected_input.shape[1]):
+            np.matmul(states[:, step - 1], recurrent_kernel, out=states[:, step])
+            states[:, step] += projected_input[:, step]
+            np.tanh(states[:, step], out=states[:, step])
+
+    def _project_distance(self, control_points: np.ndarray, finger_positions: np.ndarray, out: np.ndarray):
+        """Adds the distance from the control points to the finger times its kernel to out."""
+        distances = np.sqrt(np.sum(np.square(control_points - finger_positions), axis=-1, keepdims=True))
+        out += distances * self.hidden1_distance_kernel
+
+    def predict_teacher_forcing(self, control_points: np.ndarray, finger: np.ndarray) -> np.ndarray:
+        """
+        Same as the model with teacher forcing.
+            control_points: shape(batch, steps, 2)
+            finger: shape(batch, steps, 3 or 4), a distance in the finger data is not used
+        returns:
+            shape(batch, steps, 2), the control points of the next step
+        """
+        control_points = np.asarray(control_points, dtype=self.dtype)
+        finger = np.asarray(finger, dtype=self.dtype)
+        hidden1, hidden2 = self._get_buffers(*control_points.shape[:2])
+
+        projected = control_points @ self.hidden1_control_point_kernel
+        projected += finger[:, :, :FINGER_FEATURES] @ self.hidden1_finger_kernel
+        projected += self.hidden1_bias
+        if self.with_distance:
+            self._project_distance(control_points, finger[:, :, :2], projected)
+        self._run_rnn(projected, self.hidden1_recurrent_kernel, hidden1)
+
+        projected = hidden1 @ self.hidden2_kernel
+        projected += self.hidden2_bias
+        self._run_rnn(projected, self.hidden2_recurrent_kernel, hidden2)
+
+        output = hidden2 @ self.output_hidden_kernel
+        if self.bi_flow:
+            output += control_points @ self.output_control_point_kernel
+        output += self.output_bias
+        return output
+
+    def rollout(self, initial_control_points: np.ndarray, finger: np.ndarray) -> np.ndarray:
+        """
+        Same as the model without teacher forcing: every prediction is the input of the next step.
+        The models run every step as a sequence of length one, so the recurrent state starts
+        from zero at each step and the recurrent kernels are not used.
+            initial_control_points: shape(batch, 2) or shape(batch, steps, 2), only the first step is used
+            finger: shape(batch, steps, 3 or 4), the distance is computed from the predicted control points
+        returns:
+            shape(batch, steps, 2)
+        """
+        initial_control_points = np.asarray(initial_control_points, dtype=self.dtype)
+        if initial_control_points.ndim == 3:
+            initial_control_points = initial_control_points[:, 0]
+        finger = np.asarray(finger, dtype=self.dtype)
+        batch_size, num_steps = finger.shape[:2]
+        hidden1, hidden2 = self._get_buffers(batch_size, 1)
+        hidden1, hidden2 = hidden1[:, 0], hidden2[:, 0]
+
+        # the finger input of every step is known in advance, but the distance
+        projected_finger = finger[:, :, :FINGER_FEATURES] @ self.hidden1_finger_kernel
+        projected_finger += self.hidden1_bias
+        output_offset = np.broadcast_to(self.output_bias, (batch_size, CONTROL_POINT_WIDTH))
+        if self.bi_flow:  # the output layer always gets the initial control points
+            output_offset = initial_control_points @ self.output_control_point_kernel + self.output_bias
+
+        outputs = np.empty((batch_size, num_steps, CONTROL_POINT_WIDTH), dtype=self.dtype)
+        previous = initial_control_points
+        for step in range(num_steps):
+            np.matmul(previous, self.hidden1_control_point_kernel, out=hidden1)
+            hidden1 += projected_finger[:, step]
+            if self.with_distance:
+                self._project_distance(previous, finger[:, step, :2], hidden1)
+            np.tanh(hidden1, out=hidden1)
+            np.matmul(hidden1, self.hidden2_kernel, out=hidden2)
+            hidden2 += self.hidden2_bias
+            np.tanh(hidden2, out=hidden2)
+            np.matmul(hidden2, self.output_hidden_kernel, out=outputs[:, step])
+            outputs[:, step] += output_offset
+            previous = outputs[:, step]
+        return outputs
+
+    def predict(self, control_points: np.ndarray, finger: np.ndarray, teacher_forcing: bool = True) -> np.ndarray:
+        if teacher_forcing:
+            return self.predict_teacher_forcing(control_points, finger)
+        return self.rollout(control_points, finger)
@@ -0,0 +1,153 @@
+"""
+    What-if planning: the deformation of one sponge under many candidate finger trajectories.
+
+    The rollouts of every control point of the initial polygon under every candidate run as a single
+    batch in one traced call. The rollout of the models computes the distance from the control point
+    to the finger, the fourth finger feature, from the predicted control point of every step, so a
+    candidate only needs the finger position and force of every step.
+
+    The script plans with the validation recording: the candidates are its finger trajectory moved
+    by a random offset and with a scaled force, and the target is its last polygon.
+
+    usage:
+        python src/inference/planner.py
+        python src/inference/planner.py --model-path saved_models/best_14_50n_biflow --candidates 1024
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append('./src')
+
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
+import tensorflow as tf
+tf.get_logger().setLevel('ERROR')
+
+from final_experiment.dataset import load_datasets
+from subclassing_models import FINGER_FEATURES, rollout_step
+from utils.stored_weights import load_stored_model
+from utils.xla import make_function
+
+STORED_MODEL_DIR: str = "src/final_experiment/saved_models/best_e2_rs"  # FINAL MODEL
+NUM_STEPS: int = 100  # fixed by the rollout of subclassing_models
+NUM_CANDIDATES: int = 256
+OFFSET_SCALE: float = 0.1  # standard deviation of the offset of the candidate finger positions
+FORCE_SCALE: float = 0.2  # standard deviation of the factor of the candidate forces
+
+
+class RolloutPlanner:
+    """
+    Rollouts without teacher forcing of one polygon under a batch of finger trajectories.
+    """
+
+    def __init__(self, model: tf.keras.Model, num_steps: int = NUM_STEPS, jit_compile: bool = False):
+        """
+        model: built model of subclassing_models, with or without the distance to the finger
+        jit_compile: compile the rollout with XLA, falling back to graph mode if XLA fails, see utils.xla
+        """
+        self.model = model
+        self.num_steps = num_steps
+        # a single trace for every number of control points and candidates
+        self.rollout_function = make_function(
+            self.rollout_graph,
+            jit_compile,
+            name="the rollout of the planner",
+            input_signature=[
+                tf.TensorSpec(shape=(None, 2), dtype=tf.float32),
+                tf.TensorSpec(shape=(None, num_steps, FINGER_FEATURES), dtype=tf.float32),
+            ],
+        )
+
+    def rollout_graph(self, polygon, fingers):
+        """rollout with tensors, for the traced functions that use the planner, e.g. inference/trajectory_optimizer.py"""
+        num_points, num_candidates = tf.shape(polygon)[0], tf.shape(fingers)[0]
+        # one row per control point of every candidate: row = candidate * points + point
+        initial = tf.tile(polygon, [num_candidates, 1])[:, tf.newaxis, :]
+        fingers = tf.repeat(fingers, num_points, axis=0)
+        previous = initial
+        predictions = []
+        for i in range(self.num_steps):  # the distance to the finger is computed from the predicted control points
+            previous = rollout_step(self.model, previous, initial, fingers[:, i : i + 1, :])
+            predictions.append(previous)
+        return tf.reshape(tf.concat(predictions, axis=1), [num_candidates, num_points, self.num_steps, 2])
+
+    def rollout(self, polygon: np.ndarray, fingers: np.ndarray) -> np.ndarray:
+        """
+        polygon: initial control points, shape(points, 2)
+        fingers: candidate finger trajectories, shape(candidates, steps, 3 or 4): x, y, force, the distance is ignored
+        returns the predicted control points, shape(candidates, points, steps, 2)
+        """
+        polygon = np.asarray(polygon, dtype=np.float32)
+        fingers = np.asarray(fingers, dtype=np.float32)
+        if fingers.ndim != 3 or fingers.shape[1] != self.num_steps or fingers.shape[2] not in (3, 4):
+            raise ValueError(f"fingers must have shape (candidates, {self.num_steps}, 3 or 4), not {fingers.shape}")
+        return self.rollout_function(polygon, fingers[:, :, :FINGER_FEATURES]).numpy()
+
+    def costs(self, polygon: np.ndarray, fingers: np.ndarray, target: np.ndarray) -> np.ndarray:
+        """
+        Mean squared distance of the prediction of every candidate to the target, shape(candidates,)
+            target: final polygon, shape(points, 2), or the whole deformation, shape(points, steps, 2)
+        """
+        predictions = self.rollout(polygon, fingers)
+        if np.ndim(target) == 2:
+            predictions = predictions[:, :, -1]
+        return np.mean((predictions - target) ** 2, axis=tuple(range(1, predictions.ndim)))
+
+    def plan(self, polygon: np.ndarray, fingers: np.ndarray, target: np.ndarray) -> tuple[int, np.ndarray]:
+        """Returns the index of the candidate closest to the target and the costs of every candidate."""
+        costs = self.costs(polygon, fingers, target)
+        return int(np.argmin(costs)), costs
+
+
+def make_candidates(
+    finger: np.ndarray, num_candidates: int, offset_scale: float = OFFSET_SCALE, force_scale: float = FORCE_SCALE, seed: int = 0
+) -> np.ndarray:
+    """
+    Candidates around a finger trajectory of shape(steps, 3 or 4), the first candidate is the trajectory itself.
+    returns shape(candidates, steps, 3)
+    """
+    random = np.random.default_rng(seed)
+    candidates = np.repeat(finger[np.newaxis, :, :FINGER_FEATURES], num_candidates, axis=0).astype(np.float32)
+    candidates[1:, :, :2] += random.normal(0, offset_scale, (num_candidates - 1, 1, 2))
+    candidates[1:, :, 2] *= 1 + random.normal(0, force_scale, (num_candidates - 1, 1))
+    return candidates
+
+
+def run_planner(model_path: str, num_candidates: int = NUM_CANDIDATES, jit_compile: bool = False):
+    _, validation_dataset = load_datasets()
+    polygon = validation_dataset["X_control_points"][:, 0]
+    target = validation_dataset["Y"][:, -1]
+    candidates = make_candidates(validation_dataset["X_finger"][0], num_candidates)
+
+    planner = RolloutPlanner(load_stored_model(model_path), jit_compile=jit_compile)
+    planner.rollout(polygon, candidates[:1])  # traces the rollout
+
+    start_time = time.perf_counter()
+    best, costs = planner.plan(polygon, candidates, target)
+    batched_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for candidate in candidates[:16]:
+        planner.costs(polygon, candidate[np.newaxis], target)
+    looped_time = (time.perf_counter() - start_time) / 16 * num_candidates
+
+    print(f"{num_candidates} candidates x {polygon.shape[0]} control points")
+    print(f"batched: {batched_time * 1e3:.1f}ms, one call per candidate: {looped_time * 1e3:.1f}ms (estimated from 16)")
+    print(f"cost of the recorded trajectory: {costs[0]:.3e}")
+    print(f"best candidate: {best}, cost {costs[best]:.3e}, offset {candidates[best, 0, :2] - candidates[0, 0, :2]}")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--model-path", default=STORED_MODEL_DIR, help="stored model used to plan")
+    parser.add_argument("--candidates", type=int, default=NUM_CANDIDATES, help="finger trajectories evaluated")
+    parser.add_argument("--xla", default=False, action=argparse.BooleanOptionalAction, help="compile the rollout with XLA")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    run_planner(args.model_path, args.candidates, args.xla)
@@ -0,0 +1,269 @@
+"""
+    Local HTTP server that keeps a model warm and predicts the deformation of the sponge.
+
+    The concurrent requests are batched along the control point dimension: the batching thread
+    waits up to --max-wait-ms for more requests after the first one and runs them through the
+    model at once, up to --max-batch-size control points.
+
+    endpoints:
+        POST /predict: {"control_points": (points, 2), "finger": (steps, 3) or (points, steps, 3)}
+            -> {"control_points": (points, steps, 2)}, the rollout without teacher forcing
+            of every control point of the initial polygon, the finger data is x, y and force,
+            the model computes the distance to the finger, a fourth column is ignored
+        GET /metrics: latency, batch sizes and throughput since the server started
+
+    usage:
+        python src/inference/server.py
+        python src/inference/server.py --model-path saved_models/best_14_50n_biflow --port 8500
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.append('./src')
+
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
+import tensorflow as tf
+tf.get_logger().setLevel('ERROR')
+
+from subclassing_models import FINGER_FEATURES
+from utils.dtype_policy import PRECISION_POLICIES, check_dataset, set_precision
+from utils.stored_weights import load_stored_model
+
+STORED_MODEL_DIR: str = "src/final_experiment/saved_models/best_e2_rs"  # FINAL MODEL
+HOST: str = "127.0.0.1"
+PORT: int = 8500
+MAX_BATCH_SIZE: int = 1024  # control points per batch
+MAX_WAIT_MS: float = 2.0
+NUM_STEPS: int = 100  # fixed by the rollout of subclassing_models
+LATENCY_WINDOW: int = 1000  # requests kept for the latency percentiles
+
+
+class ServerMetrics:
+    """
+    Counters of the server, updated by the batching thread and read by the /metrics handler.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+        self.requests = 0
+        self.control_points = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)  # seconds from the arrival of the request to its result
+        self.queue_times = deque(maxlen=window)  # seconds waiting for the batch to start
+        self.model_times = deque(maxlen=window)  # seconds of the model, one per batch
+        self.batch_sizes = deque(maxlen=window)  # control points per batch
+
+    def record_batch(self, arrival_times: list[float], start_time: float, end_time: float, batch_size: int):
+        with self.lock:
+            self.requests += len(arrival_times)
+            self.control_points += batch_size
+            self.batches += 1
+            self.latencies.extend(end_time - arrival_time for arrival_time in arrival_times)
+            self.queue_times.extend(start_time - arrival_time for arrival_time in arrival_times)
+            self.model_times.append(end_time - start_time)
+            self.batch_sizes.append(batch_size)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def summary(self) -> dict:
+        percentiles = lambda values: (
+            dict(zip(("p50", "p90", "p99"), (np.percentile(values, [50, 90, 99]) * 1e3).tolist())) if values else {}
+        )
+        with self.lock:
+            uptime = time.perf_counter() - self.start_time
+            return {
+                "uptime_s": uptime,
+                "requests": self.requests,
+                "control_points": self.control_points,
+                "batches": self.batches,
+                "errors": self.errors,
+                "requests_per_s": self.requests / uptime,
+                "control_points_per_s": self.control_points / uptime,
+                "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+                "mean_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+                "latency_ms": percentiles(self.latencies),
+                "queue_ms": percentiles(self.queue_times),
+                "model_ms": percentiles(self.model_times),
+            }
+
+
+class BatchPredictor:
+    """
+    Runs the rollout of the model for batches of requests in a background thread.
+    """
+
+    def __init__(self, model: tf.keras.Model, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.model = model
+        self.model.setTeacherForcing(False)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1e3
+        self.metrics = ServerMetrics()
+        self.requests: queue.Queue = queue.Queue()
+        self.pending_request = None  # taken from the queue but left for the next batch
+        # a single trace for every batch size
+        self.predict_function = tf.function(
+            lambda control_points, finger: self.model((control_points, finger), training=False),
+            input_signature=[
+                tf.TensorSpec(shape=(None, 1, 2), dtype=tf.float32),
+                tf.TensorSpec(shape=(None, NUM_STEPS, FINGER_FEATURES), dtype=tf.float32),
+            ],
+        )
+        self.thread = threading.Thread(target=self._run, name="batch-predictor", daemon=True)
+
+    def start(self):
+        """Traces the model before the first request and starts the batching thread."""
+        self.predict_function(
+            np.zeros((1, 1, 2), dtype=np.float32), np.zeros((1, NUM_STEPS, FINGER_FEATURES), dtype=np.float32)
+        )
+        self.thread.start()
+
+    def submit(self, control_points: np.ndarray, finger: np.ndarray) -> Future:
+        """
+        control_points: shape(points, 2), finger: shape(steps, 3 or 4) or shape(points, steps, 3 or 4)
+        The future gets the predictions, shape(points, steps, 2).
+        """
+        control_points = np.asarray(control_points, dtype=np.float32)
+        finger = np.asarray(finger, dtype=np.float32)
+        if control_points.ndim != 2 or control_points.shape[1] != 2:
+            raise ValueError(f"control_points must have shape (points, 2), not {control_points.shape}")
+        if finger.ndim == 2:  # the same finger trajectory for every control point
+            finger = np.broadcast_to(finger, (control_points.shape[0], *finger.shape))
+        if finger.shape[:2] != (control_points.shape[0], NUM_STEPS) or finger.shape[2:] not in ((3,), (4,)):
+            raise ValueError(
+                f"finger must have shape ({NUM_STEPS}, 3 or 4) or "
+                f"({control_points.shape[0]}, {NUM_STEPS}, 3 or 4), not {finger.shape}"
+            )
+        finger = finger[:, :, :FINGER_FEATURES]  # the model computes the distance
+        future = Future()
+        self.requests.put((time.perf_counter(), control_points, finger, future))
+        return future
+
+    def _next_batch(self) -> list:
+        """
+        Waits for the requests of the next batch, a request that would take the batch past
+        max_batch_size control points is kept for the following one.
+        """
+        if self.pending_request is not None:
+            batch, self.pending_request = [self.pending_request], None
+        else:
+            batch = [self.requests.get()]
+        batch_size = batch[0][1].shape[0]
+        deadline = time.perf_counter() + self.max_wait
+        while batch_size < self.max_batch_size:
+            try:
+                request = self.requests.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            if batch_size + request[1].shape[0] > self.max_batch_size:
+                self.pending_request = request
+                break
+            batch.append(request)
+            batch_size += request[1].shape[0]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            arrival_times, control_points, fingers, futures = zip(*batch)
+            start_time = time.perf_counter()
+            try:
+                inputs = {
+                    "control_points": np.concatenate(control_points)[:, np.newaxis, :],
+                    "finger": np.concatenate(fingers),
+                }
+                check_dataset(inputs, "batch")
+                predictions = self.predict_function(inputs["control_points"], inputs["finger"]).numpy()
+            except Exception as error:
+                for future in futures:
+                    future.set_exception(error)
+                    self.metrics.record_error()
+                continue
+            end_time = time.perf_counter()
+            split_indices = np.cumsum([points.shape[0] for points in control_points])[:-1]
+            for future, prediction in zip(futures, np.split(predictions, split_indices)):
+                future.set_result(prediction)
+            self.metrics.record_batch(list(arrival_times), start_time, end_time, predictions.shape[0])
+
+
+def make_handler(predictor: BatchPredictor) -> type:
+    class PredictionHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, content: dict):
+            body = json.dumps(content).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send_json(200, predictor.metrics.summary())
+            else:
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+                return
+            try:
+                content = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                future = predictor.submit(content["control_points"], content["finger"])
+            except (ValueError, KeyError, TypeError) as error:
+                predictor.metrics.record_error()
+                self._send_json(400, {"error": f"{type(error).__name__}: {error}"})
+                return
+            try:
+                self._send_json(200, {"control_points": future.result().tolist()})
+            except Exception as error:
+                self._send_json(500, {"error": f"{type(error).__name__}: {error}"})
+
+        def log_message(self, format, *args):  # one line per request would slow down the server
+            pass
+
+    return PredictionHandler
+
+
+def serve(model_path: str, host: str = HOST, port: int = PORT, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+    predictor = BatchPredictor(load_stored_model(model_path), max_batch_size, max_wait_ms)
+    predictor.start()
+    server = ThreadingHTTPServer((host, port), make_handler(predictor))
+    print(f"Serving {model_path} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(predictor.metrics.summary(), indent=2))
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--model-path", default=STORED_MODEL_DIR, help="stored model to serve")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE, help="control points per batch")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="time a batch waits for more requests")
+    parser.add_argument("--precision", choices=PRECISION_POLICIES, default="float32", help="keras dtype policy of the model")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    set_precision(args.precision)
+    serve(args.model_path, args.host, args.port, args.max_batch_size, args.max_wait_ms)
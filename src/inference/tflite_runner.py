@@ -0,0 +1,137 @@
+"""
+    Runs a model exported by inference/export_tflite.py and checks it against the keras model.
+
+    Only the TFLite interpreter is needed to run the model: tflite_runtime is used when it is installed,
+    TensorFlow otherwise. The check compares the rollout of both models on the validation recording
+    and measures the latency of one step for all the control points of a frame.
+
+    usage:
+        python src/inference/tflite_runner.py exported_models/best_e2_rs_none.tflite
+        python src/inference/tflite_runner.py exported_models/best_14_50n_biflow_int8.tflite --model-path saved_models/best_14_50n_biflow
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append('./src')
+
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
+
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:  # the runtime is not installed, use the interpreter of TensorFlow
+    import tensorflow as tf
+    Interpreter = tf.lite.Interpreter
+
+from inference.numpy_model import FINGER_FEATURES
+
+STORED_MODEL_DIR: str = "src/final_experiment/saved_models/best_e2_rs"  # FINAL MODEL
+NUM_LATENCY_STEPS: int = 1000
+LATENCY_TARGET: float = 1e-3  # seconds per step
+
+
+class TFLiteDeformationTracker:
+    """
+    The step and rollout signatures of an exported model, in the style of NumpyDeformationTracker.
+    """
+
+    def __init__(self, model_file: str, num_threads: int = 1):
+        self.interpreter = Interpreter(model_path=model_file, num_threads=num_threads)
+        self.step_runner = self.interpreter.get_signature_runner("step")
+        self.rollout_runner = self.interpreter.get_signature_runner("rollout")
+
+    def step(self, previous: np.ndarray, initial: np.ndarray, finger: np.ndarray) -> np.ndarray:
+        """
+        One step without teacher forcing.
+            previous: shape(batch, 2), control points predicted by the last step
+            initial: shape(batch, 2), control points of the first step
+            finger: shape(batch, 3 or 4), finger input of this step, the distance is computed from previous
+        returns:
+            shape(batch, 2)
+        """
+        return self.step_runner(
+            previous=np.asarray(previous, dtype=np.float32),
+            initial=np.asarray(initial, dtype=np.float32),
+            finger=np.asarray(finger[:, :FINGER_FEATURES], dtype=np.float32),
+        )["control_points"]
+
+    def rollout(self, initial_control_points: np.ndarray, finger: np.ndarray) -> np.ndarray:
+        """
+            initial_control_points: shape(batch, 2) or shape(batch, steps, 2), only the first step is used
+            finger: shape(batch, steps, 3 or 4), the distance is computed from the predicted control points
+        returns:
+            shape(batch, steps, 2)
+        """
+        initial_control_points = np.asarray(initial_control_points, dtype=np.float32)
+        if initial_control_points.ndim == 3:
+            initial_control_points = initial_control_points[:, 0]
+        return self.rollout_runner(
+            initial=initial_control_points, finger=np.asarray(finger[:, :, :FINGER_FEATURES], dtype=np.float32)
+        )["control_points"]
+
+
+def measure_step_latency(model: TFLiteDeformationTracker, dataset: dict, num_steps: int = NUM_LATENCY_STEPS) -> np.ndarray:
+    """Seconds of every call to step, fed with the control points of the dataset like the online loop."""
+    initial = dataset["X_control_points"][:, 0].astype(np.float32)
+    finger = dataset["X_finger"].astype(np.float32)
+    previous = model.step(initial, initial, finger[:, 0])  # the first call allocates the tensors
+    latencies = np.empty(num_steps)
+    for index in range(num_steps):
+        start_time = time.perf_counter()
+        previous = model.step(previous, initial, finger[:, index % finger.shape[1]])
+        latencies[index] = time.perf_counter() - start_time
+    return latencies
+
+
+def check_model(model_file: str, model_path: str, num_threads: int = 1):
+    import tensorflow as tf
+    tf.get_logger().setLevel('ERROR')
+    from final_experiment.dataset import load_datasets
+    from utils.stored_weights import load_stored_model
+
+    _, validation_dataset = load_datasets()
+    control_points = validation_dataset["X_control_points"].astype(np.float32)
+    finger = validation_dataset["X_finger"].astype(np.float32)
+    target = validation_dataset["Y"]
+
+    keras_model = load_stored_model(model_path)
+    keras_model.setTeacherForcing(False)
+    keras_prediction = keras_model((control_points[:, :1], finger), training=False).numpy()
+    tflite_model = TFLiteDeformationTracker(model_file, num_threads)
+    tflite_prediction = tflite_model.rollout(control_points, finger)
+
+    # the online loop: one step at a time
+    step_prediction = np.empty_like(tflite_prediction)
+    previous = control_points[:, 0]
+    for step in range(finger.shape[1]):
+        previous = step_prediction[:, step] = tflite_model.step(previous, control_points[:, 0], finger[:, step])
+
+    print(f"Max difference with keras, rollout: {np.max(np.abs(tflite_prediction - keras_prediction)):.3e}")
+    print(f"Max difference with keras, step by step: {np.max(np.abs(step_prediction - keras_prediction)):.3e}")
+    print(f"Validation MSE, keras: {np.mean((keras_prediction - target) ** 2):.6e}")
+    print(f"Validation MSE, tflite: {np.mean((tflite_prediction - target) ** 2):.6e}")
+
+    latencies = measure_step_latency(tflite_model, validation_dataset)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(
+        f"Step latency for {control_points.shape[0]} control points on {num_threads} thread(s): "
+        f"p50 {p50 * 1e6:.1f}us, p99 {p99 * 1e6:.1f}us"
+        f"{'' if p50 < LATENCY_TARGET else f' (above the target of {LATENCY_TARGET * 1e3:.0f}ms)'}"
+    )
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("model_file", help="exported .tflite model")
+    parser.add_argument("--model-path", default=STORED_MODEL_DIR, help="stored keras model the file was exported from")
+    parser.add_argument("--threads", type=int, default=1, help="threads of the interpreter")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    check_model(args.model_file, args.model_path, args.threads)
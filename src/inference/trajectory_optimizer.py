@@ -0,0 +1,174 @@
+"""
+    Inverse planning: the finger trajectory that deforms the sponge into a target polygon.
+
+    The rollout of the model is differentiable in the finger data, so the position and the force of
+    every step are optimized by gradient descent (Adam) on the distance between the predicted last
+    polygon and the target. Many candidate trajectories are optimized in parallel, as one batch of the
+    rollout, and every iteration runs inside a single traced function. The best candidate is returned.
+
+    The script starts from random variations of the validation recording and targets its last polygon,
+    the recorded trajectory is one solution.
+
+    usage:
+        python src/inference/trajectory_optimizer.py
+        python src/inference/trajectory_optimizer.py --model-path saved_models/best_14_50n_biflow --candidates 64 --iterations 300
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append('./src')
+
+os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # to supress tf warnings
+import tensorflow as tf
+tf.get_logger().setLevel('ERROR')
+
+from final_experiment.dataset import load_datasets
+from inference.planner import NUM_STEPS, RolloutPlanner, make_candidates
+from subclassing_models import FINGER_FEATURES
+from utils.stored_weights import load_stored_model
+from utils.xla import make_function
+
+STORED_MODEL_DIR: str = "src/final_experiment/saved_models/best_e2_rs"  # FINAL MODEL
+NUM_CANDIDATES: int = 32
+NUM_ITERATIONS: int = 200
+LEARNING_RATE: float = 0.01
+SMOOTHNESS: float = 1.0  # weight of the squared change of the finger data between steps
+FORCE_RANGE: tuple[float, float] = (0.0, 1.0)  # range of the normalized force
+OFFSET_SCALE: float = 0.2  # of the random starting candidates, see planner.make_candidates
+# Adam
+BETA_1: float = 0.9
+BETA_2: float = 0.999
+EPSILON: float = 1e-7
+
+
+class TrajectoryOptimizer:
+    """
+    Batched gradient descent on candidate finger trajectories, through the rollout of RolloutPlanner.
+    """
+
+    def __init__(
+        self,
+        model: tf.keras.Model,
+        num_steps: int = NUM_STEPS,
+        learning_rate: float = LEARNING_RATE,
+        smoothness: float = SMOOTHNESS,
+        jit_compile: bool = False,
+    ):
+        """
+        model: built model of subclassing_models, its weights are not changed
+        smoothness: weight of the squared change of the finger data between steps in the cost
+        jit_compile: compile the iterations with XLA, falling back to graph mode if XLA fails, see utils.xla
+        """
+        self.planner = RolloutPlanner(model, num_steps)
+        self.num_steps = num_steps
+        self.learning_rate = learning_rate
+        self.smoothness = smoothness
+        # a single trace for every number of control points, candidates and iterations
+        self.optimize_function = make_function(
+            self._optimize,
+            jit_compile,
+            name="the iterations of the trajectory optimizer",
+            input_signature=[
+                tf.TensorSpec(shape=(None, 2), dtype=tf.float32),
+                tf.TensorSpec(shape=(None, 2), dtype=tf.float32),
+                tf.TensorSpec(shape=(None, num_steps, FINGER_FEATURES), dtype=tf.float32),
+                tf.TensorSpec(shape=[], dtype=tf.int32),
+            ],
+        )
+
+    def _costs(self, polygon, target, fingers):
+        """Cost of every candidate: distance of the last predicted polygon to the target plus the smoothness term."""
+        last_polygons = self.planner.rollout_graph(polygon, fingers)[:, :, -1, :]
+        costs = tf.reduce_mean(tf.square(last_polygons - target), axis=[1, 2])
+        changes = fingers[:, 1:, :] - fingers[:, :-1, :]
+        return costs + self.smoothness * tf.reduce_mean(tf.square(changes), axis=[1, 2])
+
+    def _optimize(self, polygon, target, fingers, num_iterations):
+        """
+        Adam on the finger data, the candidates are independent so the gradient of the summed cost
+        is the gradient of every candidate. The force is kept in FORCE_RANGE.
+        """
+        first_moment = tf.zeros_like(fingers)
+        second_moment = tf.zeros_like(fingers)
+        force_mask = tf.one_hot(2, FINGER_FEATURES)  # x, y, force
+        for iteration in tf.range(num_iterations):
+            with tf.GradientTape() as tape:
+                tape.watch(fingers)
+                cost = tf.reduce_sum(self._costs(polygon, target, fingers))
+            gradients = tape.gradient(cost, fingers)
+            first_moment = BETA_1 * first_moment + (1 - BETA_1) * gradients
+            second_moment = BETA_2 * second_moment + (1 - BETA_2) * tf.square(gradients)
+            step = tf.cast(iteration + 1, tf.float32)
+            update = (first_moment / (1 - BETA_1**step)) / (tf.sqrt(second_moment / (1 - BETA_2**step)) + EPSILON)
+            fingers = fingers - self.learning_rate * update
+            forces = tf.clip_by_value(fingers, *FORCE_RANGE)
+            fingers = force_mask * forces + (1 - force_mask) * fingers
+        return fingers, self._costs(polygon, target, fingers)
+
+    def optimize(
+        self, polygon: np.ndarray, target: np.ndarray, fingers: np.ndarray, num_iterations: int = NUM_ITERATIONS
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+            polygon: initial control points, shape(points, 2)
+            target: last polygon wanted, shape(points, 2)
+            fingers: starting candidates, shape(candidates, steps, 3 or 4), the distance is ignored
+        returns:
+            the best trajectory, shape(steps, 3), the optimized candidates, shape(candidates, steps, 3),
+            and their costs, shape(candidates,)
+        """
+        fingers = np.asarray(fingers, dtype=np.float32)
+        if fingers.ndim != 3 or fingers.shape[1] != self.num_steps or fingers.shape[2] not in (3, 4):
+            raise ValueError(f"fingers must have shape (candidates, {self.num_steps}, 3 or 4), not {fingers.shape}")
+        fingers, costs = self.optimize_function(
+            np.asarray(polygon, dtype=np.float32),
+            np.asarray(target, dtype=np.float32),
+            fingers[:, :, :FINGER_FEATURES],
+            tf.constant(num_iterations, dtype=tf.int32),
+        )
+        fingers, costs = fingers.numpy(), costs.numpy()
+        return fingers[np.argmin(costs)], fingers, costs
+
+
+def run_optimizer(
+    model_path: str, num_candidates: int = NUM_CANDIDATES, num_iterations: int = NUM_ITERATIONS, jit_compile: bool = False
+):
+    _, validation_dataset = load_datasets()
+    polygon = validation_dataset["X_control_points"][:, 0]
+    target = validation_dataset["Y"][:, -1]
+    recorded = validation_dataset["X_finger"][0, :, :FINGER_FEATURES]
+    # random variations only, the recorded trajectory is not a candidate
+    candidates = make_candidates(recorded, num_candidates + 1, offset_scale=OFFSET_SCALE, seed=1)[1:]
+
+    optimizer = TrajectoryOptimizer(load_stored_model(model_path), jit_compile=jit_compile)
+    optimizer.optimize(polygon, target, candidates[:1], num_iterations=1)  # traces the iterations
+    start_costs = optimizer.planner.costs(polygon, candidates, target)
+
+    start_time = time.perf_counter()
+    best, _, costs = optimizer.optimize(polygon, target, candidates, num_iterations)
+    elapsed = time.perf_counter() - start_time
+
+    recorded_cost = optimizer.planner.costs(polygon, recorded[np.newaxis], target)[0]
+    best_cost = optimizer.planner.costs(polygon, best[np.newaxis], target)[0]
+    print(f"{num_candidates} candidates x {num_iterations} iterations in {elapsed:.1f}s")
+    print(f"distance to the target polygon (MSE), recorded trajectory: {recorded_cost:.3e}")
+    print(f"best starting candidate: {start_costs.min():.3e}, best optimized candidate: {best_cost:.3e}")
+    print(f"mean distance of the best trajectory to the recorded one, x y force: {np.mean(np.abs(best - recorded), axis=0)}")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--model-path", default=STORED_MODEL_DIR, help="stored model used to plan")
+    parser.add_argument("--candidates", type=int, default=NUM_CANDIDATES, help="trajectories optimized in parallel")
+    parser.add_argument("--iterations", type=int, default=NUM_ITERATIONS, help="gradient descent iterations")
+    parser.add_argument("--xla", default=False, action=argparse.BooleanOptionalAction, help="compile the iterations with XLA")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    run_optimizer(args.model_path, args.candidates, args.iterations, args.xla)
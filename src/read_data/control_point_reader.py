@@ -1,4 +1,5 @@
 import os
+import time as time_module
 import numpy as np
 
 
@@ -86,35 +87,48 @@ class ControlPointHistory:
         )
 
 
-def parse_control_point_history(str_line: str) -> ControlPointHistory:
-    """Parses dodata from str_line and initializes a control point history."""
-    tokens = str_line.split()
+HIST_COLUMNS: tuple[str, ...] = (
+    "id",
+    "time_step",
+    "birth_time",
+    "death_time",
+    "x",
+    "y",
+    "prev_id",
+    "next_id",
+)
+_BRACKETS_TABLE = str.maketrans("[]", "  ")
+
+
+def parse_control_point_values(str_line: str) -> tuple[int, int, int, np.ndarray]:
+    """
+    Parses str_line without creating ControlPoint instances.
+    :return: ident, birth_time, death_time and the history as an int array [[x, y, prev, next]]
+    """
+    tokens = str_line.split(maxsplit=3)
     ident = int(tokens[0])
     birth_time = int(tokens[1])
     death_time = int(tokens[2])
 
     # History
-    rest = tokens[3:]
-    if rest[0][0] != "[":
-        raise Exception("'[' was expected but found " + rest[0] + " instead.")
-    if rest[-1][-1] != "]":
-        raise Exception("']' was expected but found " + rest[-1] + " instead.")
-    # Remove '[' and ']'
-    rest[0] = rest[0][1:]
-    rest[-1] = rest[-1][:-1]
-
-    hist = []
-    iterator = iter(rest)
-    x_str = next(iterator, False)
-    while x_str:
-        x = int(x_str[1:])
-        y = int(next(iterator))
-        prev_neighbour_index = int(next(iterator))
-        next_neighbour_index = int(next(iterator)[:-1])
-        x_str = next(iterator, False)
-        hist.append(ControlPoint(x, y, prev_neighbour_index, next_neighbour_index))
-
-    return ControlPointHistory(ident, birth_time, death_time, hist)
+    rest = tokens[3].rstrip() if len(tokens) > 3 else ""
+    if not rest.startswith("["):
+        raise Exception("'[' was expected but found " + rest + " instead.")
+    if not rest.endswith("]"):
+        raise Exception("']' was expected but found " + rest + " instead.")
+    values = rest.translate(_BRACKETS_TABLE).split()
+    history = np.array([int(value) for value in values], dtype=np.int64).reshape(-1, 4)
+
+    return ident, birth_time, death_time, history
+
+
+def parse_control_point_history(str_line: str) -> ControlPointHistory:
+    """Parses dodata from str_line and initializes a control point history."""
+    ident, birth_time, death_time, history = parse_control_point_values(str_line)
+    hist = [ControlPoint(*values) for values in history.tolist()]
+    cp_history = ControlPointHistory(ident, birth_time, death_time, hist)
+    cp_history.history_array = history.astype(np.float64)
+    return cp_history
 
 
 class ContourHistory:
@@ -122,16 +136,94 @@ class ContourHistory:
 
     def __init__(self, history_file_name: str):
         self._header = None
+        self._file_name = history_file_name
+        self._offset = 0  # bytes of the .hist file already parsed
+        self._contours: dict[int, np.ndarray] = {}  # reconstructed contours by time, read-only
         self.cp_histories: list[ControlPointHistory] = []
-        self.load(history_file_name)
+        if history_file_name.endswith(".npz"):
+            self.load_columns(history_file_name)
+        else:
+            self.load(history_file_name)
 
     def load(self, file_name: str):
-        with open(file_name, "r") as hist_file:
-            header = next(hist_file)
-            self._header = header.split()
-            print(self._header)
-            for line in hist_file:
-                self.cp_histories.append(parse_control_point_history(line))
+        self._file_name = file_name
+        self.refresh()
+        print(self._header)
+
+    def refresh(self) -> int:
+        """
+        Parses only the lines written to the .hist file since the last call,
+        so a file that is still being written by the tracker can be followed.
+        Returns the number of new control point histories.
+        """
+        if self._file_name.endswith(".npz"):
+            raise Exception("Only .hist files can be refreshed.")
+        with open(self._file_name, "rb") as hist_file:
+            hist_file.seek(self._offset)
+            data = hist_file.read()
+        # an incomplete last line is left for the next refresh
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        lines = data[:end].decode().splitlines()
+
+        if self._header is None and lines:
+            self._header = lines.pop(0).split()
+
+        new_histories = [parse_control_point_history(line) for line in lines if line.strip()]
+        self.cp_histories.extend(new_histories)
+        self._invalidate_contours(new_histories)
+        return len(new_histories)
+
+    def follow(self, poll_interval: float = 0.1):
+        """
+        Yields the new control point histories as soon as they are written to the .hist file.
+        It never stops, the caller decides when to break.
+        """
+        while True:
+            num_new = self.refresh()
+            if num_new:
+                yield from self.cp_histories[-num_new:]
+            else:
+                time_module.sleep(poll_interval)
+
+    def _invalidate_contours(self, new_histories: list[ControlPointHistory]):
+        """
+        Drops the cached contours of the times at which the new control points were alive,
+        they are reconstructed again on the next call instead of being updated in place,
+        since the new points change the neighbours of the old ones.
+        """
+        if not new_histories or not self._contours:
+            return
+        first_time = min(cp_history.birth_time for cp_history in new_histories)
+        if any(cp_history.death_time == ControlPointHistory.UNDEAD for cp_history in new_histories):
+            last_time = float("inf")
+        else:
+            last_time = max(cp_history.death_time for cp_history in new_histories)
+        for time in [time for time in self._contours if first_time <= time < last_time]:
+            del self._contours[time]
+
+    def clear_cache(self):
+        """Drops every reconstructed contour, e.g. to time reconstruct_contour without the cache."""
+        self._contours.clear()
+
+    def load_columns(self, file_name: str):
+        """
+        Loads the history from the columnar .npz written by scripts/generate_control_point_csv.py,
+        which is much faster than parsing the .hist file.
+        """
+        with np.load(file_name) as columns:
+            self._header = list(HIST_COLUMNS)
+            histories = columns["histories"]  # [[id, birth_time, death_time, rows]]
+            points = np.stack(
+                [columns[name] for name in ("x", "y", "prev_id", "next_id")], axis=1
+            )
+        for (ident, birth_time, death_time, _), history in zip(
+            histories.tolist(), np.split(points, np.cumsum(histories[:-1, 3]))
+        ):
+            hist = [ControlPoint(*values) for values in history.tolist()]
+            cp_history = ControlPointHistory(ident, birth_time, death_time, hist)
+            cp_history.history_array = history.astype(np.float64)
+            self.cp_histories.append(cp_history)
 
     def get_contour_segment(
         self, cp_ident: int, n_degree: int, time: int
@@ -155,12 +247,15 @@ class ContourHistory:
             segment.append(next)
         return segment
 
-    def reconstruct_contour(self, time: int):
+    def reconstruct_contour(self, time: int) -> np.ndarray:
         """
-        Reconstructs a list with the pairs of coordinates of all control points at time t.
+        Reconstructs the coordinates of all control points at time t, in the order of the contour.
+        The array is cached and shared by later calls, so it is read-only.
         :param time:
-        :return:
+        :return: int array [[x, y]]
         """
+        if time in self._contours:
+            return self._contours[time]
         contour = []
         first = -1
         for i, cp_hist in enumerate(self.cp_histories):
@@ -179,6 +274,9 @@ class ContourHistory:
             point = self.cp_histories[index_of_next].get_control_point(time)
             contour.append([point.x, point.y])
             index_of_next = point.next_neighbour_index
+        contour = np.array(contour)
+        contour.flags.writeable = False
+        self._contours[time] = contour
         return contour
 
     def __str__(self):
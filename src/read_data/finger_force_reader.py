@@ -1,20 +1,40 @@
 import numpy as np
 
+from read_data.text_columns_reader import read_columns
 
-def read_finger_forces_file(file_path: str) -> np.ndarray:
+FORCE_FILE_COLUMNS: tuple[str, ...] = ("time", "fx", "fy", "fz", "tx", "ty", "tz", "d")
+FORCE_AXES: tuple[str, ...] = ("fx", "fy", "fz", "tx", "ty", "tz")
+
+
+def read_finger_forces_file(
+    file_path: str, expected_rows: int = None, chunk_size: int = None
+) -> np.ndarray:
     """
     Reads the finger forces file and returns the Fz column.
     Arguments:
         forces_file: path of the forces file to read
+        expected_rows: if given, the number of rows (video frames) the file must have
+        chunk_size: if given, long sensor logs are parsed chunk_size rows at a time
+    Returns:
+        np.float32 numpy ndarray of the forces in Fz.
+    """
+    fz_column = FORCE_FILE_COLUMNS.index("fz")
+    forces = read_columns(file_path, [fz_column], expected_rows, chunk_size)
+    return forces[:, 0]
+
+
+def read_finger_force_log(
+    file_path: str, chunk_size: int = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reads the whole force/torque log of the finger sensor.
+    Arguments:
+        file_path: path of the forces file to read
+        chunk_size: if given, long sensor logs are parsed chunk_size rows at a time
     Returns:
-        np.float64 numpy ndarray of the forces in Fz.
+        times: np.float32 numpy ndarray, shape: (rows,), timestamps of the sensor
+        forces: np.float32 numpy ndarray, shape: (rows, 6), columns: fx, fy, fz, tx, ty, tz
     """
-    forces = np.loadtxt(
-        file_path,
-        dtype={
-            "names": ("time", "fx", "fy", "fz", "tx", "ty", "tz", "d"),
-            "formats": ("f", "f", "f", "f", "f", "f", "f", "f"),
-        },
-    )
-    # only_forces = forces[["fx", "fy", "fz", "tx", "ty", "tz"]]
-    return forces[["fz"][0]]
+    columns = [FORCE_FILE_COLUMNS.index(name) for name in FORCE_AXES]
+    log = read_columns(file_path, [FORCE_FILE_COLUMNS.index("time"), *columns], chunk_size=chunk_size)
+    return log[:, 0], log[:, 1:]
@@ -1,16 +1,18 @@
 import numpy as np
 
+from read_data.text_columns_reader import read_columns
 
-def read_finger_positions_file(file_path: str) -> np.ndarray:
+
+def read_finger_positions_file(
+    file_path: str, expected_rows: int = None, chunk_size: int = None
+) -> np.ndarray:
     """
     Reads the finger positions file and returns array of (x,y) coordinates.
     Arguments:
         finger_position_file: path of the forces file to read
+        expected_rows: if given, the number of rows (video frames) the file must have
+        chunk_size: if given, the file is parsed chunk_size rows at a time
     Returns:
-        (np.float32, np.float32) numpy ndarray
+        np.float32 numpy ndarray, shape: (rows, 2)
     """
-    return np.transpose(
-        np.loadtxt(
-            file_path, dtype={"names": ["cx", "cy"], "formats": ["f", "f"]}, unpack=True
-        )
-    )
+    return read_columns(file_path, [0, 1], expected_rows, chunk_size)
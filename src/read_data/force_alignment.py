@@ -0,0 +1,136 @@
+"""
+    Resamples the log of the finger force sensor onto the timeline of the video frames.
+
+    The sensor writes rows at its own rate, so the number of rows does not have to match the number of frames.
+    align_finger_forces_file interpolates the six force/torque axes at the time of every frame
+    and caches the result next to the log.
+
+    usage:
+        python src/read_data/force_alignment.py data/sponge_centre data/sponge_longside --smoothing 3
+"""
+
+import argparse
+import os
+import sys
+import numpy as np
+
+sys.path.append('./src')
+
+from read_data.finger_force_reader import read_finger_force_log, FORCE_AXES
+import utils.dataset_cache as dataset_cache
+
+ALIGNED_FORCES_FILE_NAME: str = "finger_force_aligned.npz"
+
+
+def get_frame_times(
+    sensor_times: np.ndarray, num_frames: int, fps: float = None, start_time: float = None
+) -> np.ndarray:
+    """
+    Returns the timestamp of every video frame, shape: (num_frames,).
+    Without fps the frames are spread evenly over the duration of the sensor log.
+    """
+    if fps is None:
+        return np.linspace(sensor_times[0], sensor_times[-1], num_frames)
+    first_frame_time = sensor_times[0] if start_time is None else start_time
+    return first_frame_time + np.arange(num_frames) / fps
+
+
+def smooth_forces(forces: np.ndarray, window: int) -> np.ndarray:
+    """
+    Centred moving average of every axis, the edges are padded with the first and last readings.
+        forces: shape(rows, axes)
+    """
+    if window <= 1:
+        return forces
+    padded = np.pad(forces, ((window // 2, window - 1 - window // 2), (0, 0)), mode="edge")
+    cumulative = np.cumsum(padded, axis=0, dtype=np.float64)
+    cumulative = np.concatenate((np.zeros((1, forces.shape[1])), cumulative))
+    return ((cumulative[window:] - cumulative[:-window]) / window).astype(forces.dtype)
+
+
+def resample_forces(
+    sensor_times: np.ndarray, forces: np.ndarray, frame_times: np.ndarray
+) -> np.ndarray:
+    """
+    Linear interpolation of all the axes at once, frames outside of the log take the closest reading.
+        sensor_times: shape(rows,), strictly increasing
+        forces: shape(rows, axes)
+        frame_times: shape(frames,)
+    returns:
+        shape(frames, axes)
+    """
+    sensor_times = np.asarray(sensor_times, dtype=np.float64)
+    if sensor_times.shape[0] < 2:
+        raise Exception("At least two sensor readings are needed to resample the forces.")
+    if np.any(np.diff(sensor_times) <= 0):
+        raise Exception("The timestamps of the force sensor are not strictly increasing.")
+
+    previous = np.clip(
+        np.searchsorted(sensor_times, frame_times, side="right") - 1,
+        0,
+        sensor_times.shape[0] - 2,
+    )
+    weights = (frame_times - sensor_times[previous]) / (
+        sensor_times[previous + 1] - sensor_times[previous]
+    )
+    weights = np.clip(weights, 0, 1)[:, np.newaxis]
+    aligned = forces[previous] + weights * (forces[previous + 1] - forces[previous])
+    return aligned.astype(forces.dtype)
+
+
+def align_finger_forces_file(
+    file_path: str,
+    num_frames: int,
+    fps: float = None,
+    start_time: float = None,
+    smoothing_window: int = None,
+    use_cache: bool = True,
+) -> np.ndarray:
+    """
+    Reads the force sensor log and resamples it onto the video frames.
+    Arguments:
+        file_path: path of the forces file to read
+        num_frames: number of frames of the video
+        fps: frame rate of the video, if None the frames are spread evenly over the log
+        start_time: sensor timestamp of the first frame, defaults to the first reading
+        smoothing_window: if given, readings averaged by a moving window before resampling
+        use_cache: read and write the result in finger_force_aligned.npz, next to the log
+    Returns:
+        np.float32 numpy ndarray, shape: (num_frames, 6), columns: fx, fy, fz, tx, ty, tz
+    """
+    cache_file = os.path.join(os.path.dirname(file_path), ALIGNED_FORCES_FILE_NAME)
+    cache_key = "{0}:{1}:{2}:{3}:{4}".format(
+        dataset_cache.hash_files([file_path]), num_frames, fps, start_time, smoothing_window
+    )
+    if use_cache:
+        cached = dataset_cache.load_bundle(cache_file, cache_key)
+        if cached is not None:
+            return cached["forces"]
+
+    sensor_times, forces = read_finger_force_log(file_path)
+    if smoothing_window:
+        forces = smooth_forces(forces, smoothing_window)
+    frame_times = get_frame_times(sensor_times, num_frames, fps, start_time)
+    aligned_forces = resample_forces(sensor_times, forces, frame_times)
+
+    if use_cache:
+        dataset_cache.save_bundle(
+            cache_file,
+            {"forces": aligned_forces, "frame_times": frame_times, "axes": np.array(FORCE_AXES)},
+            cache_key,
+        )
+    return aligned_forces
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resamples the force logs onto the video frames and caches them.")
+    parser.add_argument("recordings", nargs="+", help="recording directories with a finger_force.txt file")
+    parser.add_argument("--frames", type=int, default=100, help="number of frames of the videos")
+    parser.add_argument("--fps", type=float, default=None, help="frame rate, by default the frames span the log")
+    parser.add_argument("--smoothing", type=int, default=None, help="window of the moving average, in readings")
+    args = parser.parse_args()
+    for data_dir in args.recordings:
+        aligned = align_finger_forces_file(
+            os.path.join(data_dir, "finger_force.txt"), args.frames, args.fps, smoothing_window=args.smoothing
+        )
+        print(f"{os.path.join(data_dir, ALIGNED_FORCES_FILE_NAME)}: {aligned.shape}")
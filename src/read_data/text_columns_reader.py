@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+
+def iter_column_chunks(file_path: str, columns: list[int], chunk_size: int):
+    """
+    Reads chunk_size rows at a time of a whitespace separated text file.
+    Arguments:
+        file_path: path of the file to read
+        columns: indices of the columns to keep, in the order they are returned
+        chunk_size: number of rows per chunk
+    Yields:
+        np.float32 numpy ndarray, shape: (chunk_size, len(columns)), the last chunk may be shorter.
+    """
+    reader = pd.read_csv(
+        file_path,
+        sep=r"\s+",
+        header=None,
+        usecols=columns,
+        dtype=np.float32,
+        engine="c",
+        chunksize=chunk_size,
+    )
+    with reader:
+        for chunk in reader:
+            yield chunk[columns].to_numpy(dtype=np.float32)
+
+
+def read_columns(
+    file_path: str,
+    columns: list[int],
+    expected_rows: int = None,
+    chunk_size: int = None,
+) -> np.ndarray:
+    """
+    Reads only the given columns of a whitespace separated text file.
+    Arguments:
+        file_path: path of the file to read
+        columns: indices of the columns to keep, in the order they are returned
+        expected_rows: if given, the number of rows the file must have (usually the number of video frames)
+        chunk_size: if given, the file is parsed chunk_size rows at a time
+    Returns:
+        np.float32 numpy ndarray, shape: (rows, len(columns))
+    """
+    if chunk_size:
+        chunks = list(iter_column_chunks(file_path, columns, chunk_size))
+        data = (
+            np.concatenate(chunks)
+            if chunks
+            else np.zeros((0, len(columns)), dtype=np.float32)
+        )
+    else:
+        data = pd.read_csv(
+            file_path,
+            sep=r"\s+",
+            header=None,
+            usecols=columns,
+            dtype=np.float32,
+            engine="c",
+        )[columns].to_numpy(dtype=np.float32)
+
+    if expected_rows is not None and data.shape[0] != expected_rows:
+        raise Exception(
+            f"{file_path} has {data.shape[0]} rows but {expected_rows} were expected."
+        )
+    return data
@@ -2,6 +2,62 @@ from unicodedata import name
 import tensorflow as tf
 from functools import reduce
 
+
+FINGER_FEATURES: int = 3  # x, y, force, the models with 4 finger features add the distance to the finger
+
+
+def distance_to_finger(control_points, finger_positions):
+    """
+    In-graph calculte_distances of utils.dataset_creation, the distance from every control point to the finger
+        control_points: shape(batch, steps, 2)
+        finger_positions: shape(batch, steps, 2)
+    returns:
+        distances: shape(batch, steps, 1)
+    """
+    squared_distances = tf.reduce_sum(tf.square(control_points - finger_positions), axis=-1, keepdims=True)
+    return tf.sqrt(tf.maximum(squared_distances, 1e-12))  # the gradient of the norm is not defined at 0
+
+
+def uses_distance(model, finger_width: int) -> bool:
+    """
+    Whether the model takes the distance to the finger as its fourth finger feature, known from the
+    first layer once the model is built and from the width of the finger data before.
+    """
+    if model.hidden1.built:
+        return model.hidden1.cell.kernel.shape[0] == 2 + FINGER_FEATURES + 1
+    return finger_width == FINGER_FEATURES + 1
+
+
+def add_distance_to_finger(model, control_points, finger):
+    """
+    Returns the finger data with the distance from control_points to the finger as fourth feature
+    if the model takes it, so the finger data only needs x, y and force. A distance already
+    in the finger data is replaced.
+        control_points: shape(batch, steps, 2)
+        finger: shape(batch, steps, 3 or 4)
+    """
+    if not uses_distance(model, finger.shape[-1]):
+        return finger
+    return tf.concat(
+        [finger[:, :, :FINGER_FEATURES], distance_to_finger(control_points, finger[:, :, :2])], axis=-1
+    )
+
+
+def rollout_step(model, previous, initial, finger):
+    """
+    One step of the rollout without teacher forcing, with the layers of a model of this file.
+    The distance to the finger is computed from previous, the control points the model predicted.
+        previous: predicted control points of the last step, shape(batch, 1, 2)
+        initial: control points of the first step of the sequence, shape(batch, 1, 2)
+        finger: finger data of the step, shape(batch, 1, 3 or 4)
+    """
+    finger = add_distance_to_finger(model, previous, finger)
+    hidden2 = model.hidden2(model.hidden1(tf.keras.layers.Concatenate()([previous, finger])))
+    if isinstance(model, DeformationTrackerBiFlowModel):
+        hidden2 = tf.keras.layers.Concatenate()([initial, hidden2])
+    return model.output_layer(hidden2)
+
+
 # CREATE RECURRENT MODEL -------------------------------------------------------
 class DeformationTrackerModel(tf.keras.Model):
     def __init__(self, log_dir="./logs", **kwargs):
@@ -26,6 +82,7 @@ class DeformationTrackerModel(tf.keras.Model):
             name="dense_out",
             kernel_initializer="random_normal",
             bias_initializer="zeros",
+            dtype="float32",  # float32 predictions with the mixed precision policies too
         )
         self.__use_teacher_forcing__ = True
         self.log_dir = log_dir
@@ -40,7 +97,7 @@ class DeformationTrackerModel(tf.keras.Model):
         if self.__use_teacher_forcing__:  # With teacher forcing
             print("Using teacher forcing")
             layer_input = tf.keras.layers.Concatenate()(
-                [control_point_input, finger_input]
+                [control_point_input, add_distance_to_finger(self, control_point_input, finger_input)]
             )
             hidden1 = self.hidden1(layer_input)
             hidden2 = self.hidden2(hidden1)
@@ -55,20 +112,15 @@ class DeformationTrackerModel(tf.keras.Model):
             layer_outputs = []
 
             # TODO fix: WARNING:tensorflow:5 out of the last 9 calls to <function Model.make_predict_function.<locals>.predict_function at 0x7f5a62e04e50> triggered tf.function retracing. Tracing is expensive and the excessive number of tracings could be due to (1) creating @tf.function repeatedly in a loop, (2) passing tensors with different shapes, (3) passing Python objects instead of tensors. For (1), please define your @tf.function outside of the loop. For (2), @tf.function has experimental_relax_shapes=True option that relaxes argument shapes that can avoid unnecessary retracing. For (3), please refer to https://www.tensorflow.org/guide/function#controlling_retracing and https://www.tensorflow.org/api_docs/python/tf/function for  more details.
-            execute_model = lambda input_data: self.output_layer(
-                self.hidden2(self.hidden1(tf.keras.layers.Concatenate()(input_data)))
-            )
+            initial_control_point = layer_output
             for i in range(100):
                 # tf.keras.backend.clear_session() # to solve this: https://stackoverflow.com/questions/66712301/creating-models-in-a-loop-makes-keras-increasingly-slower
-                # next_layer_input = tf.keras.layers.Concatenate()([layer_output, finger_input[:,i:i+1,:]])
-                # hidden1 = self.hidden1(next_layer_input)
-                # hidden2 = self.hidden2(hidden1)
-                # layer_output = self.output_layer(hidden2)
-                layer_output = execute_model(
-                    [layer_output, finger_input[:, i : i + 1, :]]
+                # the distance to the finger is computed from the predicted control point
+                layer_output = rollout_step(
+                    self, layer_output, initial_control_point, finger_input[:, i : i + 1, :]
                 )
                 layer_outputs.append(layer_output)
-            concat_func = lambda x, y: tf.keras.layers.Concatenate(axis=1)([x, y])
+            concat_func = lambda x, y: tf.keras.layers.Concatenate(axis=1, dtype="float32")([x, y])
             model_output = reduce(concat_func, layer_outputs)
             return model_output
 
@@ -96,6 +148,7 @@ class DeformationTrackerBiFlowModel(tf.keras.Model):
             name="dense_out",
             kernel_initializer="random_normal",
             bias_initializer="zeros",
+            dtype="float32",  # float32 predictions with the mixed precision policies too
         )
         self.__use_teacher_forcing__ = True
         self.log_dir = log_dir
@@ -110,7 +163,7 @@ class DeformationTrackerBiFlowModel(tf.keras.Model):
         if self.__use_teacher_forcing__:  # With teacher forcing
             print("Using teacher forcing")
             layer_input = tf.keras.layers.Concatenate()(
-                [control_point_input, finger_input]
+                [control_point_input, add_distance_to_finger(self, control_point_input, finger_input)]
             )
             hidden1 = self.hidden1(layer_input)
             hidden2 = self.hidden2(hidden1)
@@ -128,29 +181,15 @@ class DeformationTrackerBiFlowModel(tf.keras.Model):
             layer_outputs = []
 
             # TODO fix: WARNING:tensorflow:5 out of the last 9 calls to <function Model.make_predict_function.<locals>.predict_function at 0x7f5a62e04e50> triggered tf.function retracing. Tracing is expensive and the excessive number of tracings could be due to (1) creating @tf.function repeatedly in a loop, (2) passing tensors with different shapes, (3) passing Python objects instead of tensors. For (1), please define your @tf.function outside of the loop. For (2), @tf.function has experimental_relax_shapes=True option that relaxes argument shapes that can avoid unnecessary retracing. For (3), please refer to https://www.tensorflow.org/guide/function#controlling_retracing and https://www.tensorflow.org/api_docs/python/tf/function for  more details.
-            # execute_model = lambda input_data: self.output_layer(
-            #     self.hidden2(self.hidden1(tf.keras.layers.Concatenate()(input_data)))
-            # )
+            initial_control_point = layer_output
             for i in range(100):
                 # tf.keras.backend.clear_session() # to solve this: https://stackoverflow.com/questions/66712301/creating-models-in-a-loop-makes-keras-increasingly-slower
-                # FIXME: distance_to_finger = # use calculte_distances()
-                next_layer_input = tf.keras.layers.Concatenate()([layer_output, finger_input[:,i:i+1,:]])
-                hidden1 = self.hidden1(next_layer_input)
-                hidden2 = self.hidden2(hidden1)
-                last_layer_input = tf.keras.layers.Concatenate()(
-                    [
-                    control_point_input[
-                        :, :1, :
-                    ],
-                    # layer_output,
-                    hidden2
-                    ]
+                # the distance to the finger is computed from the predicted control point,
+                # not read from finger_input, which has the distance to the real one
+                layer_output = rollout_step(
+                    self, layer_output, initial_control_point, finger_input[:, i : i + 1, :]
                 )
-                layer_output = self.output_layer(last_layer_input)
-                # layer_output = execute_model(
-                #     [layer_output, finger_input[:, i : i + 1, :]]
-                # )
                 layer_outputs.append(layer_output)
-            concat_func = lambda x, y: tf.keras.layers.Concatenate(axis=1)([x, y])
+            concat_func = lambda x, y: tf.keras.layers.Concatenate(axis=1, dtype="float32")([x, y])
             model_output = reduce(concat_func, layer_outputs)
             return model_output
\ No newline at end of file
@@ -0,0 +1,74 @@
+import tensorflow as tf
+
+SAVE_FREQ: int = 100  # epochs
+MAX_TO_KEEP: int = 3
+
+
+def warm_start(model: tf.keras.Model, checkpoint_dir: str, input_shape=None):
+    """
+    Initializes the model with the weights of a previous training, reading the checkpoint once.
+        checkpoint_dir: directory of the ModelCheckpoint callback (save_weights_only) of the previous training
+        input_shape: passed to model.build, by default [(None, None, 2), (None, None, 4)]
+    The optimizer state of the previous training is left out, the new training starts its own.
+    """
+    model.build(input_shape=input_shape or [(None, None, 2), (None, None, 4)])  # init model weights
+    model.load_weights(checkpoint_dir).expect_partial()
+    print(f"Using stored model: {checkpoint_dir}")
+
+
+class CheckpointManager(tf.keras.callbacks.Callback):
+    """
+    callback to resume interrupted trainings
+    every save_freq epochs the weights, the optimizer state and the number of finished epochs are saved
+    in directory, only the last max_to_keep checkpoints are kept
+    restore() loads the last checkpoint and returns the epoch to pass as initial_epoch to fit
+    """
+
+    def __init__(self, directory, save_freq=SAVE_FREQ, max_to_keep=MAX_TO_KEEP):
+        """
+        directory: directory of the checkpoints, one per training
+        save_freq: epochs between checkpoints
+        max_to_keep: checkpoints kept, the older ones are deleted
+        """
+        super(CheckpointManager, self).__init__()
+        self.directory = directory
+        self.save_freq = save_freq
+        self.max_to_keep = max_to_keep
+        self.epoch = tf.Variable(0, dtype=tf.int64, trainable=False, name="epoch")
+        self.saved_epoch = 0
+        self.last_epoch = 0
+        self.manager = None
+
+    def _get_manager(self, model: tf.keras.Model) -> tf.train.CheckpointManager:
+        if self.manager is None:
+            checkpoint = tf.train.Checkpoint(model=model, optimizer=model.optimizer, epoch=self.epoch)
+            self.manager = tf.train.CheckpointManager(checkpoint, self.directory, max_to_keep=self.max_to_keep)
+        return self.manager
+
+    def restore(self, model: tf.keras.Model) -> int:
+        """
+        Loads the last checkpoint into the compiled model, returns the number of finished epochs, 0 if there is none.
+        The variables that do not exist yet, like the optimizer slots, are restored when they are created.
+        """
+        manager = self._get_manager(model)
+        if manager.latest_checkpoint is None:
+            return 0
+        # partial: when the training is already finished the model is never built
+        manager.checkpoint.restore(manager.latest_checkpoint).expect_partial()
+        self.saved_epoch = self.last_epoch = int(self.epoch.numpy())
+        print(f"Resuming from {manager.latest_checkpoint}, {self.saved_epoch} epochs done")
+        return self.saved_epoch
+
+    def save(self, epochs_done: int):
+        self.epoch.assign(epochs_done)
+        self._get_manager(self.model).save(checkpoint_number=epochs_done)
+        self.saved_epoch = epochs_done
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.last_epoch = epoch + 1
+        if self.last_epoch - self.saved_epoch >= self.save_freq:
+            self.save(self.last_epoch)
+
+    def on_train_end(self, logs=None):
+        if self.last_epoch > self.saved_epoch:  # e.g. stopped by EarlyStopping
+            self.save(self.last_epoch)
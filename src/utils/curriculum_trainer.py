@@ -0,0 +1,120 @@
+import numpy as np
+import tensorflow as tf
+
+from subclassing_models import rollout_step
+from utils.fused_trainer import FusedTrainer, mean_squared_error
+
+# (epochs, rollout horizon, probability of feeding the ground truth instead of the prediction)
+# the last stage lasts until the end of the training
+CURRICULUM: tuple[tuple[int, int, float], ...] = (
+    (500, 10, 0.5),
+    (500, 25, 0.25),
+    (1000, 50, 0.0),
+    (0, 100, 0.0),
+)
+WINDOWS_PER_SEQUENCE: int = 1
+
+
+class CurriculumTrainer(FusedTrainer):
+    """
+    Full-batch training without teacher forcing on short windows of the rollout.
+
+    The rollout of the model feeds every prediction to the next step, so backpropagating through the
+    100 steps of a sequence is the slowest part of the training. Instead each epoch trains
+    windows_per_sequence windows of every sequence, starting at a random step from the ground truth
+    control points, and the windows grow with the stages of the curriculum until they cover the whole
+    sequence. Inside a window the ground truth replaces the prediction of the last step with the
+    teacher probability of the stage (scheduled sampling). Like in the rollout of the model, the distance
+    to the finger is computed from the control points fed to every step.
+
+    The validation loss is the loss of the whole rollout, so the model must be in the mode without
+    teacher forcing. Like FusedTrainer the callbacks run every epochs_per_call epochs, and at the
+    start of every stage.
+    """
+
+    def __init__(
+        self,
+        model: tf.keras.Model,
+        stages=CURRICULUM,
+        windows_per_sequence: int = WINDOWS_PER_SEQUENCE,
+        optimizer=None,
+        loss_fn=mean_squared_error,
+        jit_compile: bool = False,
+    ):
+        """
+        stages: (epochs, rollout horizon, teacher probability) of every stage, see CURRICULUM
+        windows_per_sequence: windows trained per sequence and epoch
+        """
+        super(CurriculumTrainer, self).__init__(model, optimizer, loss_fn, jit_compile)
+        self.stages = stages
+        self.windows_per_sequence = windows_per_sequence
+        self._data = None
+        self._stage_functions = {}
+
+    def get_stage(self, epoch: int) -> tuple[int, int]:
+        """Returns the index of the stage of the epoch and the epoch where the stage ends, None for the last one."""
+        end_epoch = 0
+        for index, (stage_epochs, _, _) in enumerate(self.stages[:-1]):
+            end_epoch += stage_epochs
+            if epoch < end_epoch:
+                return index, end_epoch
+        return len(self.stages) - 1, None
+
+    def count_rollout_steps(self, epochs: int, num_sequences: int, initial_epoch: int = 0) -> int:
+        """Steps of the rollout trained from initial_epoch to epochs, the cost of the training without the validation."""
+        steps = 0
+        epoch = initial_epoch
+        while epoch < epochs:
+            index, end_epoch = self.get_stage(epoch)
+            stage_epochs = min(end_epoch or epochs, epochs) - epoch
+            steps += stage_epochs * num_sequences * self.windows_per_sequence * self.stages[index][1]
+            epoch += stage_epochs
+        return steps
+
+    def _rollout(self, control_points, initial, finger, teacher_probability: float):
+        """
+        Rollout of the windows, control_points are the ground truth inputs of every step of the window.
+        """
+        previous = control_points[:, :1]
+        predictions = []
+        for i in range(finger.shape[1]):
+            if i > 0 and teacher_probability > 0:
+                use_ground_truth = tf.random.uniform([tf.shape(previous)[0], 1, 1]) < teacher_probability
+                previous = tf.where(use_ground_truth, control_points[:, i : i + 1], previous)
+            previous = rollout_step(self.model, previous, initial, finger[:, i : i + 1])
+            predictions.append(previous)
+        return tf.concat(predictions, axis=1)
+
+    def _build_stage(self, index: int):
+        """Traces the epochs of a stage, the horizon sets the length of the unrolled loop."""
+        (control_points, finger), y, validation_data = self._data
+        _, horizon, teacher_probability = self.stages[index]
+        num_sequences, num_steps = control_points.shape[0], control_points.shape[1]
+        if horizon > num_steps:
+            raise ValueError(f"rollout horizon {horizon} is longer than the {num_steps} steps of the sequences")
+
+        # the rows of the windows, windows_per_sequence per sequence
+        rows = tf.constant(np.tile(np.arange(num_sequences), self.windows_per_sequence), dtype=tf.int32)
+        control_points, finger, y = (tf.gather(data, rows) for data in (control_points, finger, y))
+        initial = control_points[:, :1]
+
+        def training_loss():
+            starts = tf.random.uniform([rows.shape[0]], maxval=num_steps - horizon + 1, dtype=tf.int32)
+            steps = starts[:, tf.newaxis] + tf.range(horizon)
+            window = lambda data: tf.gather(data, steps, batch_dims=1)
+            predictions = self._rollout(window(control_points), initial, window(finger), teacher_probability)
+            return self.loss_fn(window(y), predictions)
+
+        return self._build_run_epochs((control_points, finger), y, validation_data, training_loss)
+
+    def _prepare(self, x, y, validation_data):
+        self._data = (x, y, validation_data)
+        self._stage_functions = {}
+
+    def _get_run_epochs(self, epoch: int) -> tuple:
+        index, end_epoch = self.get_stage(epoch)
+        if index not in self._stage_functions:  # traced when the stage is reached
+            self._stage_functions[index] = self._build_stage(index)
+            _, horizon, teacher_probability = self.stages[index]
+            print(f"Curriculum stage {index + 1}/{len(self.stages)}: horizon {horizon}, teacher probability {teacher_probability}")
+        return self._stage_functions[index], end_epoch
@@ -0,0 +1,65 @@
+"""
+    Stores arrays in a versioned .npz bundle tagged with the content hash of the files they were built from.
+"""
+
+import hashlib
+import os
+from typing import Optional
+import numpy as np
+
+BUNDLE_VERSION: int = 1
+HASH_CHUNK_SIZE: int = 1 << 20  # 1 MiB
+
+VERSION_KEY: str = "__version__"
+SOURCE_HASH_KEY: str = "__source_hash__"
+
+
+def hash_files(file_paths: list[str]) -> str:
+    """
+    Returns the sha256 hex digest of the contents of the files, in the given order.
+    """
+    digest = hashlib.sha256()
+    for file_path in file_paths:
+        with open(file_path, "rb") as source_file:
+            for chunk in iter(lambda: source_file.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_bundle(bundle_path: str, arrays: dict[str, np.ndarray], source_hash: str):
+    """
+    Writes the arrays into bundle_path along with the bundle version and the source hash.
+    The file is replaced atomically, so a reader never sees a half written bundle.
+    """
+    bundle_dir = os.path.dirname(bundle_path)
+    if bundle_dir:
+        os.makedirs(bundle_dir, exist_ok=True)
+
+    tmp_path = f"{bundle_path}.tmp"
+    with open(tmp_path, "wb") as bundle_file:
+        np.savez(
+            bundle_file,
+            **{VERSION_KEY: np.array(BUNDLE_VERSION), SOURCE_HASH_KEY: np.array(source_hash)},
+            **arrays,
+        )
+    os.replace(tmp_path, bundle_path)
+
+
+def load_bundle(bundle_path: str, source_hash: str) -> Optional[dict[str, np.ndarray]]:
+    """
+    Returns the arrays stored in bundle_path,
+    or None if the bundle does not exist, has another version or was built from different sources.
+    """
+    if not os.path.exists(bundle_path):
+        return None
+
+    with np.load(bundle_path) as bundle:
+        if VERSION_KEY not in bundle.files or int(bundle[VERSION_KEY]) != BUNDLE_VERSION:
+            return None
+        if SOURCE_HASH_KEY not in bundle.files or str(bundle[SOURCE_HASH_KEY]) != source_hash:
+            return None
+        return {
+            key: bundle[key]
+            for key in bundle.files
+            if key not in (VERSION_KEY, SOURCE_HASH_KEY)
+        }
@@ -5,7 +5,7 @@ def create_basic_dataset(polygons: np.ndarray):
     """Creates dataset with data from a npy file"""
     X_data = np.reshape(polygons, (polygons.shape[0], -1))
 
-    y_data = np.zeros(X_data.shape)
+    y_data = np.zeros(X_data.shape, dtype=X_data.dtype)
     y_data[:-1] = X_data[1:]
     y_data[-1] = X_data[-1]
 
@@ -23,14 +23,14 @@ def create_polygon_datapoint(
     flat_polygons = np.reshape(polygons, (polygons.shape[0], -1))
 
     # create X_data
-    X_data = np.zeros((flat_polygons.shape[0], flat_polygons.shape[1] + 3))
+    X_data = np.zeros((flat_polygons.shape[0], flat_polygons.shape[1] + 3), dtype=flat_polygons.dtype)
     for index, flat_polygon in enumerate(flat_polygons):
         X_data[index, 0 : flat_polygon.shape[0]] = flat_polygon
         X_data[index, flat_polygon.shape[0] : -1] = finger_positions[index]
         X_data[index, -1] = finger_force[index]
 
     # create y_data
-    y_data = np.zeros(flat_polygons.shape)
+    y_data = np.zeros(flat_polygons.shape, dtype=flat_polygons.dtype)
     y_data[:-1] = flat_polygons[1:]
     y_data[-1] = flat_polygons[-1]
 
@@ -58,7 +58,7 @@ def rotate_plygons(polygons: np.ndarray):
     """
     Takes the first coordinate of the polygon and puts it in the end of the list
     """
-    rotated_polygons = np.zeros(polygons.shape)
+    rotated_polygons = np.zeros(polygons.shape, dtype=polygons.dtype)
     for index, polygon in enumerate(polygons):
         rotated_polygons[index, :-1] = polygon[1:]
         rotated_polygons[index, -1] = polygon[0]
@@ -131,7 +131,7 @@ def create_single_control_point_dataset(
         X_data.append(control_point_sequece)
 
     # create y_data
-    y_data = np.zeros((47, 100, 2))
+    y_data = np.zeros((47, 100, 2), dtype=polygons.dtype)
     for contol_point_index in range(polygons.shape[1]):
         control_point_sequece = polygons[:, contol_point_index, :]
         y_data[contol_point_index, :-1] = control_point_sequece[1:]
@@ -157,7 +157,7 @@ def create_teacher_forcing_dataset(
     )  # shape (47,100,3)
 
     # create y_data, shape: (47,100,2)
-    y_data = np.zeros((num_control_points, 100, 2))
+    y_data = np.zeros((num_control_points, 100, 2), dtype=polygons.dtype)
     for contol_point_index in range(polygons.shape[1]):
         control_point_sequece = polygons[:, contol_point_index, :]
         y_data[contol_point_index, :-1] = control_point_sequece[1:]
@@ -178,7 +178,7 @@ def create_no_teacher_forcing_dataset(
     ] * 47  # shape (47,100,3)
 
     # create y_data, cp expected sequence
-    y_data = np.zeros((47, 100, 2))
+    y_data = np.zeros((47, 100, 2), dtype=polygons.dtype)
     for contol_point_index in range(polygons.shape[1]):
         control_point_sequece = polygons[:, contol_point_index, :]
         y_data[contol_point_index, :-1] = control_point_sequece[1:]
@@ -197,7 +197,7 @@ def calculte_distances(control_points, finger_positions):
     """
     num_control_points: int = control_points.shape[0]  # 47
     num_steps: int = control_points.shape[1]  # 100
-    distances = np.zeros((num_control_points, num_steps))
+    distances = np.zeros((num_control_points, num_steps), dtype=control_points.dtype)
     for i in range(num_control_points):
         difference = control_points[i] - finger_positions
         sum_sq = np.sqrt(np.sum(np.power(difference, 2), axis=1))
@@ -216,17 +216,18 @@ def create_calculated_values_dataset(
     """
     # create X_data
     num_control_points: int = polygons.shape[1]  # 47
+    num_steps: int = polygons.shape[0]  # 100
     X_control_points = polygons.swapaxes(0, 1)  # shape: (47, 100, 2)
     distance_to_finger = calculte_distances(X_control_points, finger_positions)
     X_finger_data = np.array(
-        [np.append(finger_positions, finger_force.reshape(100, 1), axis=1)]
+        [np.append(finger_positions, finger_force.reshape(num_steps, 1), axis=1)]
         * num_control_points
     )  # shape (47,100,3)
     X_finger_data = np.append(
-        X_finger_data, distance_to_finger.reshape(47, 100, 1), axis=2
+        X_finger_data, distance_to_finger.reshape(num_control_points, num_steps, 1), axis=2
     )  # shape (47,100,4)
     # create y_data, shape: (47,100,2)
-    y_data = np.zeros((num_control_points, 100, 2))
+    y_data = np.zeros((num_control_points, num_steps, 2), dtype=polygons.dtype)
     for contol_point_index in range(polygons.shape[1]):
         control_point_sequece = polygons[:, contol_point_index, :]
         y_data[contol_point_index, :-1] = control_point_sequece[1:]
@@ -0,0 +1,41 @@
+"""
+    Floating point types of the data and the models.
+
+    The datasets are float32 from the readers to the model inputs, keras would otherwise cast float64
+    arrays to float32 on every batch. Mixed precision is opt-in: the layers compute in float16 or bfloat16,
+    the variables and the output layer stay in float32.
+"""
+
+import numpy as np
+
+FLOAT_DTYPE = np.float32
+PRECISION_POLICIES: tuple[str, ...] = ("float32", "mixed_float16", "mixed_bfloat16")
+
+
+def check_dataset(dataset: dict[str, np.ndarray], name: str = "dataset"):
+    """
+    Raises a TypeError if a floating point array of the dataset is not float32,
+    used by the dataset loaders, ModelFactory.predict and the prediction server.
+    """
+    wrong_arrays = [
+        f"{key} ({array.dtype})"
+        for key, array in dataset.items()
+        if np.issubdtype(array.dtype, np.floating) and array.dtype != FLOAT_DTYPE
+    ]
+    if wrong_arrays:
+        raise TypeError(f"The {name} must be {np.dtype(FLOAT_DTYPE).name} before reaching the model: {', '.join(wrong_arrays)}")
+
+
+def set_precision(policy: str = "float32"):
+    """
+    Sets the global keras policy, call it before the models are created.
+        policy: one of PRECISION_POLICIES
+    model.compile wraps the optimizer for the loss scaling of mixed_float16, see utils.fused_trainer for the custom loop.
+    """
+    if policy not in PRECISION_POLICIES:
+        raise ValueError(f"Unknown precision {policy}, expected one of {PRECISION_POLICIES}")
+    import tensorflow as tf  # imported here, the dataset side of the module only needs numpy
+
+    tf.keras.mixed_precision.set_global_policy(policy)
+    if policy != "float32":
+        print(f"Using {policy} precision")
@@ -0,0 +1,142 @@
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from utils.xla import make_function
+
+EPOCHS_PER_CALL: int = 100
+
+
+def mean_squared_error(y_true, y_pred):
+    """Same value as the "mse" loss of model.compile for a single batch."""
+    return tf.reduce_mean(tf.keras.losses.mean_squared_error(y_true, y_pred))
+
+
+class FusedTrainer:
+    """
+    Full-batch training for datasets that fit in one batch, like the 94 sequences of the training set.
+
+    Every call to the traced function runs epochs_per_call epochs inside a tf.range loop, one optimizer
+    step on the whole training set per epoch, and keeps the train and validation losses on the device.
+    Python only runs between calls, where the callbacks get the losses of the last epoch,
+    so checkpoints, logs and early stopping happen every epochs_per_call epochs
+    (the patience of EarlyStopping is counted in calls). on_epoch_begin gets the first epoch of the call
+    and the number of epochs it runs as logs["epochs"], on_epoch_end the last epoch, and the call itself
+    is reported as a single train batch, see TimingCallback and ProfilerCallback.
+    """
+
+    def __init__(
+        self, model: tf.keras.Model, optimizer=None, loss_fn=mean_squared_error, jit_compile: bool = False
+    ):
+        """
+        model: the optimizer of model.compile is used when optimizer is None
+        jit_compile: compile the epochs with XLA, falling back to graph mode if XLA fails, see utils.xla
+        """
+        self.model = model
+        self.optimizer = optimizer or model.optimizer
+        self.loss_fn = loss_fn
+        self.jit_compile = jit_compile
+        self._run_epochs = None
+
+    def _build_run_epochs(self, x, y, validation_data, training_loss=None):
+        """
+        Traces the loop once, the data is captured as constants so only the number of epochs is an argument.
+            training_loss: function () -> loss of an epoch, by default the loss of the model on (x, y)
+        """
+        model, optimizer, loss_fn = self.model, self.optimizer, self.loss_fn
+        training_loss = training_loss or (lambda: loss_fn(y, model(x, training=True)))
+        # model.compile wraps the optimizer in a LossScaleOptimizer with the mixed_float16 policy
+        loss_scaling = hasattr(optimizer, "get_scaled_loss")
+
+        def run_epochs(num_epochs):
+            train_losses = tf.TensorArray(tf.float32, size=num_epochs, element_shape=[])
+            validation_losses = tf.TensorArray(
+                tf.float32, size=num_epochs if validation_data is not None else 0, element_shape=[]
+            )
+            for epoch in tf.range(num_epochs):
+                with tf.GradientTape() as tape:
+                    loss = training_loss()
+                    scaled_loss = optimizer.get_scaled_loss(loss) if loss_scaling else loss
+                gradients = tape.gradient(scaled_loss, model.trainable_variables)
+                if loss_scaling:
+                    gradients = optimizer.get_unscaled_gradients(gradients)
+                optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+                train_losses = train_losses.write(epoch, loss)
+                if validation_data is not None:
+                    validation_losses = validation_losses.write(
+                        epoch, loss_fn(validation_data[1], model(validation_data[0], training=False))
+                    )
+            return train_losses.stack(), validation_losses.stack()
+
+        return make_function(
+            run_epochs,
+            self.jit_compile,
+            name="the epochs of the fused trainer",
+            input_signature=[tf.TensorSpec(shape=[], dtype=tf.int32)],
+        )
+
+    def _prepare(self, x, y, validation_data):
+        """Called by fit with the data as tensors, before the first epoch."""
+        self._run_epochs = self._build_run_epochs(x, y, validation_data)
+
+    def _get_run_epochs(self, epoch: int) -> tuple:
+        """
+        Returns the traced loop that trains the epochs from epoch on, and the epoch where it stops
+        being the one to use, None if it is used until the end of the training.
+        """
+        return self._run_epochs, None
+
+    def fit(
+        self,
+        x,
+        y,
+        epochs: int,
+        validation_data=None,
+        epochs_per_call: int = EPOCHS_PER_CALL,
+        callbacks=None,
+        verbose: bool = True,
+        initial_epoch: int = 0,
+    ) -> dict:
+        """
+        Trains the model like model.fit with batch_size equal to the size of the training set.
+        Returns the loss, and val_loss if there is validation data, of every epoch run.
+        """
+        to_tensor = lambda data: tf.nest.map_structure(lambda array: tf.constant(array, dtype=tf.float32), data)
+        x, y = to_tensor(x), to_tensor(y)
+        if validation_data is not None:
+            validation_data = (to_tensor(validation_data[0]), to_tensor(validation_data[1]))
+        self._prepare(x, y, validation_data)
+
+        callback_list = tf.keras.callbacks.CallbackList(
+            callbacks, add_history=False, model=self.model, epochs=epochs, steps=1, verbose=0
+        )
+        history: dict[str, list] = {"loss": []}
+        if validation_data is not None:
+            history["val_loss"] = []
+
+        self.model.stop_training = False
+        callback_list.on_train_begin()
+        epoch = initial_epoch
+        while epoch < epochs and not self.model.stop_training:
+            run_epochs, end_epoch = self._get_run_epochs(epoch)
+            num_epochs = min(epochs_per_call, (end_epoch or epochs) - epoch, epochs - epoch)
+            start_time = time.perf_counter()
+            callback_list.on_epoch_begin(epoch, {"epochs": num_epochs})
+            callback_list.on_train_batch_begin(0)
+            train_losses, validation_losses = run_epochs(tf.constant(num_epochs, dtype=tf.int32))
+            callback_list.on_train_batch_end(0)
+            history["loss"].extend(train_losses.numpy().tolist())
+            if validation_data is not None:
+                history["val_loss"].extend(validation_losses.numpy().tolist())
+            epoch += num_epochs
+
+            logs = {name: values[-1] for name, values in history.items()}
+            callback_list.on_epoch_end(epoch - 1, logs)
+            if verbose:
+                elapsed = time.perf_counter() - start_time
+                losses = " - ".join(f"{name}: {value:.4e}" for name, value in logs.items())
+                print(f"Epoch {epoch}/{epochs} - {elapsed:.2f}s ({elapsed / num_epochs * 1e3:.2f}ms/epoch) - {losses}")
+        callback_list.on_train_end({name: values[-1] for name, values in history.items() if values})
+
+        return {name: np.array(values) for name, values in history.items()}
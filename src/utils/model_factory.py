@@ -0,0 +1,90 @@
+"""
+    Builds the models of subclassing_models with fixed input signatures and keeps their traced functions.
+
+    The teacher forcing mode is read when the model is traced, so switching it on a keras model
+    retraces predict and evaluate, or worse reuses the graph of the other mode when the shapes match.
+    A ModelFactory traces one function per mode, with the batch as the only free dimension, and reuses it
+    for every dataset and every set of weights.
+"""
+
+import functools
+
+import numpy as np
+import tensorflow as tf
+
+from subclassing_models import DeformationTrackerBiFlowModel
+from utils.dtype_policy import check_dataset
+from utils.stored_weights import get_checkpoint_prefix, read_stored_weights
+
+FINGER_WIDTH: int = 4  # x, y, force, distance
+NUM_STEPS: int = 100
+MODES: tuple[str, ...] = ("teacher", "free")
+
+
+class ModelFactory:
+    """
+    One built model of model_class and one traced function per mode:
+        teacher: control points shape(None, num_steps, 2), finger shape(None, num_steps, finger_width)
+        free: control points shape(None, 1, 2), finger shape(None, num_steps, finger_width)
+    """
+
+    def __init__(self, model_class=DeformationTrackerBiFlowModel, finger_width=FINGER_WIDTH, num_steps=NUM_STEPS):
+        self.model_class = model_class
+        self.finger_width = finger_width
+        self.num_steps = num_steps
+        self.model = model_class()
+        self.model.build(input_shape=[(None, num_steps, 2), (None, num_steps, finger_width)])  # init model weights
+        self.model.compile(loss="mse", optimizer="adam")  # model.evaluate and model.save keep working
+        self.signatures = {
+            mode: [
+                tf.TensorSpec(shape=(None, num_steps if mode == "teacher" else 1, 2), dtype=tf.float32),
+                tf.TensorSpec(shape=(None, num_steps, finger_width), dtype=tf.float32),
+            ]
+            for mode in MODES
+        }
+        self.functions = {mode: self._make_function(mode) for mode in MODES}
+        for function in self.functions.values():  # warm up, each function is traced here and only here
+            function.get_concrete_function()
+
+    def _make_function(self, mode: str):
+        """The mode is fixed when the function is traced, the signature keeps it from being traced again."""
+
+        def predict(control_points, finger):
+            self.model.setTeacherForcing(mode == "teacher")
+            return self.model((control_points, finger), training=False)
+
+        return tf.function(predict, input_signature=self.signatures[mode])
+
+    def load_weights(self, model_path: str):
+        """
+        Loads the weights of a SavedModel directory, a keras-tuner trial or a ModelCheckpoint directory,
+        reading only its checkpoint. The traced functions read the variables, so they are not retraced.
+        """
+        self.model.set_weights(read_stored_weights(get_checkpoint_prefix(model_path)))
+        print(f"Using stored model: {model_path}")
+
+    def predict(self, control_points: np.ndarray, finger: np.ndarray, teacher_forcing: bool = False) -> np.ndarray:
+        """
+        control_points: shape(batch, num_steps, 2), without teacher forcing only the first step is used
+        finger: shape(batch, num_steps, finger_width)
+        Both must be float32 like the datasets of final_experiment/dataset.py, a TypeError is raised otherwise.
+        """
+        check_dataset({"control_points": control_points, "finger": finger}, "input of the model")
+        mode = "teacher" if teacher_forcing else "free"
+        if not teacher_forcing:
+            control_points = control_points[:, :1]
+        return self.functions[mode](tf.constant(control_points), tf.constant(finger)).numpy()
+
+    def evaluate(self, control_points: np.ndarray, finger: np.ndarray, y: np.ndarray, teacher_forcing: bool = False) -> float:
+        """MSE of the predictions, same value as model.evaluate with loss="mse"."""
+        return float(np.mean((self.predict(control_points, finger, teacher_forcing) - y) ** 2))
+
+    def get_tracing_counts(self) -> dict[str, int]:
+        """Times the function of every mode has been traced, 1 each."""
+        return {mode: function.experimental_get_tracing_count() for mode, function in self.functions.items()}
+
+
+@functools.lru_cache(maxsize=None)
+def get_model_factory(model_class=DeformationTrackerBiFlowModel, finger_width=FINGER_WIDTH, num_steps=NUM_STEPS) -> ModelFactory:
+    """Returns the ModelFactory of the combination, built the first time it is asked for."""
+    return ModelFactory(model_class, finger_width, num_steps)
@@ -57,6 +57,13 @@ def normalize_polygons(polygons):
     return transformed_polygons
 
 
+def get_normalization_params(polygons):
+    """returns the center and scale used by normalize_polygons and normalize_finger_position"""
+    means = get_polygons_centers(polygons)
+    scale = get_scale(polygons)
+    return means[0], scale
+
+
 def normalize_finger_position(polygons, finger_positions):
     norm_finger_positions = np.copy(finger_positions)
     means = get_polygons_centers(polygons)
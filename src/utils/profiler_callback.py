@@ -0,0 +1,74 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+
+import tensorflow as tf
+
+NUM_TOP_ENTRIES: int = 50  # functions and allocation sites kept in the text reports
+
+
+class ProfilerCallback(tf.keras.callbacks.Callback):
+    """
+    callback to profile a range of epochs
+    the TensorFlow profiler writes its trace into <log_dir>/plugins/profile, where the profile tab
+    of TensorBoard finds it, the Python side is profiled with cProfile and tracemalloc and the reports
+    are written to <log_dir>/profile/<run>
+    """
+
+    def __init__(self, log_dir, epochs=None):
+        """
+        log_dir: logs directory of the run, usually the one of the TensorBoard callback
+        epochs: (first, last) epochs to profile, both included, None disables the callback
+        """
+        super(ProfilerCallback, self).__init__()
+        self.log_dir = log_dir
+        self.epochs = epochs
+        self.profiler = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        # the fused trainers run logs["epochs"] epochs from epoch on between two calls of the callbacks
+        last_epoch = epoch + (logs or {}).get("epochs", 1) - 1
+        if self.epochs is None or self.profiler is not None:
+            return
+        # starts on the first epoch inside [first, last], even if the first one is never seen
+        if epoch <= self.epochs[1] and last_epoch >= self.epochs[0]:
+            self.start()
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self.profiler is not None and epoch >= self.epochs[1]:
+            self.stop()
+
+    def on_train_end(self, logs=None):
+        if self.profiler is not None:  # the training ended before the last profiled epoch
+            self.stop()
+
+    def start(self):
+        print(f"\nProfiling epochs {self.epochs[0]} to {self.epochs[1]}")
+        tracemalloc.start()
+        tf.profiler.experimental.start(self.log_dir)
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        tf.profiler.experimental.stop()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        report_dir = os.path.join(self.log_dir, "profile", time.strftime("run_%Y_%m_%d-%H_%M_%S"))
+        os.makedirs(report_dir, exist_ok=True)
+        self.profiler.dump_stats(os.path.join(report_dir, "python.prof"))  # e.g. for snakeviz
+        with open(os.path.join(report_dir, "python.txt"), "w") as report_file:
+            stats = pstats.Stats(self.profiler, stream=report_file)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(NUM_TOP_ENTRIES)
+        with open(os.path.join(report_dir, "tracemalloc.txt"), "w") as report_file:
+            report_file.write(f"Peak traced memory: {peak_memory / 1024**2:.2f} MiB\n\n")
+            for statistic in snapshot.statistics("lineno")[:NUM_TOP_ENTRIES]:
+                report_file.write(f"{statistic}\n")
+
+        print(f"\nProfile saved in {self.log_dir}")
+        self.profiler = None
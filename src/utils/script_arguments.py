@@ -1,5 +1,7 @@
 import argparse
 
+from utils.dtype_policy import PRECISION_POLICIES
+
 
 def get_script_args():
     """Returns the arguments passed to the script"""
@@ -16,5 +18,49 @@ def get_script_args():
         default=True,
         action=argparse.BooleanOptionalAction,
     )
+    parser.add_argument(
+        "--fused",
+        help="train with utils.fused_trainer, one full batch per epoch and many epochs per tf.function call",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--curriculum",
+        help="train without teacher forcing on windows of the rollout that grow, see utils.curriculum_trainer",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--xla",
+        help="compile the training with XLA, graph mode is used if the model cannot be compiled",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--resume",
+        help="resume the training from its last checkpoint, see utils.checkpoint_manager",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--align-forces",
+        help="resample the forces onto the video frames, see read_data.force_alignment",
+        default=False,
+        action=argparse.BooleanOptionalAction,
+    )
+    parser.add_argument(
+        "--precision",
+        help="keras dtype policy, the mixed policies compute in float16 or bfloat16 with float32 variables",
+        choices=PRECISION_POLICIES,
+        default="float32",
+    )
+    parser.add_argument(
+        "--profile",
+        help="profile the training from epoch START to epoch END, both included",
+        nargs=2,
+        type=int,
+        metavar=("START", "END"),
+        default=None,
+    )
     args = parser.parse_args()
     return args
@@ -0,0 +1,111 @@
+"""
+    Reads the weights of the stored models straight from their checkpoints, without loading the models.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+import tensorflow as tf
+
+from subclassing_models import DeformationTrackerModel, DeformationTrackerBiFlowModel
+
+# checkpoint keys of the weights, in the order of model.get_weights()
+LAYER_WEIGHT_KEYS: tuple[str, ...] = (
+    "hidden1/cell/kernel",
+    "hidden1/cell/recurrent_kernel",
+    "hidden1/cell/bias",
+    "hidden2/cell/kernel",
+    "hidden2/cell/recurrent_kernel",
+    "hidden2/cell/bias",
+    "output_layer/kernel",
+    "output_layer/bias",
+)
+# SavedModels store the recurrent layers as a flat list of variables
+SAVED_MODEL_WEIGHT_KEYS: tuple[str, ...] = (
+    *(f"variables/{index}" for index in range(6)),
+    "output_layer/kernel",
+    "output_layer/bias",
+)
+VARIABLE_SUFFIX: str = "/.ATTRIBUTES/VARIABLE_VALUE"
+HIDDEN_UNITS: int = 50  # fixed by subclassing_models
+
+
+def find_stored_models(roots: list[str]) -> list[tuple[str, str]]:
+    """
+    Returns (name, checkpoint prefix) of every model stored under the roots:
+        SavedModel directories: <model>/variables/variables
+        keras-tuner trials: <trial>/checkpoint
+        ModelCheckpoint directories: <model>/checkpoint/
+    .h5 files are left out, they hold the Sequential models of the first experiments.
+    """
+    stored_models = []
+    for root in roots:
+        for directory, _, file_names in sorted(os.walk(root)):
+            for file_name in sorted(file_names):
+                if file_name == "variables.index":
+                    model_dir = os.path.dirname(directory)
+                elif file_name in ("checkpoint.index", ".index"):
+                    model_dir = directory
+                else:
+                    continue
+                prefix = os.path.join(directory, file_name[: -len(".index")])
+                stored_models.append((os.path.relpath(model_dir), prefix))
+    return stored_models
+
+
+def get_checkpoint_prefix(model_path: str) -> str:
+    """
+    Returns the checkpoint prefix of a SavedModel directory, a keras-tuner trial or a ModelCheckpoint
+    directory, any other path is taken as a prefix already.
+    """
+    candidates = (
+        os.path.join(model_path, "variables", "variables"),
+        os.path.join(model_path, "checkpoint"),
+        os.path.join(model_path, ""),
+        os.path.join(model_path, "checkpoint", ""),
+    )
+    for prefix in candidates:
+        if os.path.exists(prefix + ".index"):
+            return prefix
+    return model_path
+
+
+def read_stored_weights(prefix: str) -> list[np.ndarray]:
+    """
+    Reads the weights of the checkpoint, in the order of model.get_weights().
+    """
+    reader = tf.compat.v1.train.NewCheckpointReader(prefix)
+    keys = LAYER_WEIGHT_KEYS if reader.has_tensor(LAYER_WEIGHT_KEYS[0] + VARIABLE_SUFFIX) else SAVED_MODEL_WEIGHT_KEYS
+    return [reader.get_tensor(key + VARIABLE_SUFFIX) for key in keys]
+
+
+def get_architecture(weights: list[np.ndarray], finger_width: int) -> tuple[Optional[type], str]:
+    """
+    Returns the model class able to hold the weights, or None and the reason why there is none.
+    """
+    input_width, hidden_units = weights[0].shape
+    if hidden_units != HIDDEN_UNITS:
+        return None, f"{hidden_units} hidden units"
+    if input_width != 2 + finger_width:
+        return None, f"finger input of width {input_width - 2}"
+    if weights[6].shape[0] == hidden_units:
+        return DeformationTrackerModel, "ok"
+    if weights[6].shape[0] == hidden_units + 2:
+        return DeformationTrackerBiFlowModel, "ok"
+    return None, f"output layer input of width {weights[6].shape[0]}"
+
+
+def load_stored_model(model_path: str) -> tf.keras.Model:
+    """
+    Builds the model class matching the stored weights and loads them, without deserializing the stored model.
+    """
+    weights = read_stored_weights(get_checkpoint_prefix(model_path))
+    finger_width = weights[0].shape[0] - 2
+    model_class, status = get_architecture(weights, finger_width)
+    if model_class is None:
+        raise Exception(f"{model_path} does not match a model of subclassing_models: {status}")
+    model = model_class()
+    model.build(input_shape=[(None, None, 2), (None, None, finger_width)])  # init model weights
+    model.set_weights(weights)
+    return model
@@ -0,0 +1,151 @@
+import csv
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+OVERHEAD_THRESHOLD: float = 0.5  # fraction of the epoch outside of the train steps and the validation
+
+CSV_COLUMNS: tuple[str, ...] = (
+    "epoch",
+    "epochs",
+    "epoch_time",
+    "train_time",
+    "validation_time",
+    "overhead_fraction",
+    "batches",
+    "batch_p50",
+    "batch_p90",
+    "batch_p99",
+    "samples_per_second",
+    "train_tracing_count",
+    "test_tracing_count",
+    "peak_rss_mb",
+    "overhead_dominated",
+)
+
+
+def get_tracing_count(function) -> int:
+    """Times the tf.function has been traced, -1 if the model runs eagerly."""
+    if function is None or not hasattr(function, "experimental_get_tracing_count"):
+        return -1
+    return function.experimental_get_tracing_count()
+
+
+def get_peak_rss_mb() -> float:
+    if resource is None:
+        return float("nan")
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak_rss / 1024**2 if os.uname().sysname == "Darwin" else peak_rss / 1024
+
+
+class TimingCallback(tf.keras.callbacks.Callback):
+    """
+    callback to record where the time of the training goes
+    every epoch writes a row to <log_dir>/timing/<run>/timing.csv and, every log_freq epochs,
+    the same values as TensorBoard scalars next to it
+    with the fused trainers a row covers the logs["epochs"] epochs run between two calls of the callbacks,
+    its epoch being the last one, and the train time is the time of the call
+    """
+
+    def __init__(self, log_dir, num_samples=None, log_freq=10, overhead_threshold=OVERHEAD_THRESHOLD):
+        """
+        log_dir: logs directory of the run, usually the one of the TensorBoard callback
+        num_samples: training sequences per epoch, used for the samples per second
+        log_freq: how often the scalars are written and the overhead is reported
+        overhead_threshold: fraction of the epoch outside of the train steps and the validation
+            above which the epoch is flagged as dominated by input or host overhead
+        """
+        super(TimingCallback, self).__init__()
+        self.log_dir = log_dir
+        self.num_samples = num_samples
+        self.log_freq = log_freq
+        self.overhead_threshold = overhead_threshold
+        # the file and the writer are opened in on_train_begin,
+        # so keras-tuner can copy the callback for every trial
+        self.csv_file = None
+        self.csv_writer = None
+        self.file_writer = None
+
+    def on_train_begin(self, logs=None):
+        run_dir = os.path.join(self.log_dir, "timing", time.strftime("run_%Y_%m_%d-%H_%M_%S"))
+        os.makedirs(run_dir, exist_ok=True)
+        self.csv_file = open(os.path.join(run_dir, "timing.csv"), "w", newline="")
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(CSV_COLUMNS)
+        self.file_writer = tf.summary.create_file_writer(run_dir)
+        self.flagged_epochs = 0
+        self.window_epochs = 0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epochs = (logs or {}).get("epochs", 1)
+        self.batch_times = []
+        self.validation_time = 0.0
+        self.epoch_start = time.perf_counter()
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self.batch_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.batch_times.append(time.perf_counter() - self.batch_start)
+
+    def on_test_begin(self, logs=None):
+        self.validation_start = time.perf_counter()
+
+    def on_test_end(self, logs=None):
+        self.validation_time += time.perf_counter() - self.validation_start
+
+    def on_epoch_end(self, epoch, logs=None):
+        epoch_time = time.perf_counter() - self.epoch_start
+        train_time = float(np.sum(self.batch_times))
+        overhead_fraction = max(epoch_time - train_time - self.validation_time, 0.0) / epoch_time
+        batch_p50, batch_p90, batch_p99 = (
+            np.percentile(self.batch_times, [50, 90, 99]) if self.batch_times else (np.nan,) * 3
+        )
+        values = {
+            "epoch": epoch,
+            "epochs": self.epochs,
+            "epoch_time": epoch_time,
+            "train_time": train_time,
+            "validation_time": self.validation_time,
+            "overhead_fraction": overhead_fraction,
+            "batches": len(self.batch_times),
+            "batch_p50": batch_p50,
+            "batch_p90": batch_p90,
+            "batch_p99": batch_p99,
+            "samples_per_second": self.num_samples * self.epochs / epoch_time if self.num_samples else np.nan,
+            "train_tracing_count": get_tracing_count(self.model.train_function),
+            "test_tracing_count": get_tracing_count(self.model.test_function),
+            "peak_rss_mb": get_peak_rss_mb(),
+            "overhead_dominated": int(overhead_fraction > self.overhead_threshold),
+        }
+        self.csv_writer.writerow([values[column] for column in CSV_COLUMNS])
+        self.flagged_epochs += values["overhead_dominated"] * self.epochs
+        self.window_epochs += self.epochs
+
+        # whether one of the epochs of the row is a multiple of log_freq
+        if epoch // self.log_freq == (epoch - self.epochs) // self.log_freq:
+            return
+        self.csv_file.flush()
+        with self.file_writer.as_default():
+            for name in CSV_COLUMNS[1:]:
+                tf.summary.scalar(f"timing/{name}", values[name], step=epoch)
+        if self.flagged_epochs:
+            print(
+                f"\nTimingCallback: {self.flagged_epochs} of the last {self.window_epochs} epochs spent more than "
+                f"{self.overhead_threshold:.0%} of their time outside of the train steps and the validation"
+            )
+        self.flagged_epochs = 0
+        self.window_epochs = 0
+
+    def on_train_end(self, logs=None):
+        self.csv_file.close()
+        self.file_writer.close()
+        self.csv_file = self.csv_writer = self.file_writer = None
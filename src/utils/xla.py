@@ -0,0 +1,97 @@
+"""
+    Opt-in XLA compilation with a fallback to the usual graph mode.
+
+    The recurrent layers are tiny, so on CPU most of the time of a step goes to launching kernels,
+    XLA fuses them. Not every op can be compiled though, so the compiled functions fall back
+    to a plain tf.function the first time XLA fails.
+"""
+
+import tensorflow as tf
+
+# errors raised when XLA cannot compile a function
+XLA_ERRORS = (
+    tf.errors.InvalidArgumentError,
+    tf.errors.UnimplementedError,
+    tf.errors.InternalError,
+    tf.errors.NotFoundError,
+)
+
+
+def report_fallback(name: str, error: Exception):
+    first_line = str(error).strip().split("\n")[0]
+    print(f"XLA could not compile {name}, using graph mode instead: {type(error).__name__}: {first_line}")
+
+
+class XlaFunction:
+    """
+    tf.function compiled with XLA, replaced by a plain tf.function the first time the compilation fails.
+    """
+
+    def __init__(self, python_function, name=None, **function_kwargs):
+        """
+        function_kwargs: passed to both tf.function, e.g. input_signature
+        """
+        self.name = name or getattr(python_function, "__name__", "function")
+        self.xla_function = tf.function(python_function, jit_compile=True, **function_kwargs)
+        self.graph_function = tf.function(python_function, **function_kwargs)
+        self.use_xla = True
+
+    def __call__(self, *args, **kwargs):
+        if self.use_xla:
+            try:
+                return self.xla_function(*args, **kwargs)
+            except XLA_ERRORS as error:
+                report_fallback(self.name, error)
+                self.use_xla = False
+        return self.graph_function(*args, **kwargs)
+
+
+def make_function(python_function, jit_compile: bool, name=None, **function_kwargs):
+    """Returns an XlaFunction if jit_compile, a plain tf.function otherwise."""
+    if jit_compile:
+        return XlaFunction(python_function, name=name, **function_kwargs)
+    return tf.function(python_function, **function_kwargs)
+
+
+def supports_xla(model: tf.keras.Model, x, y) -> bool:
+    """
+    Compiles the loss and the gradients of the model with XLA, without updating the weights.
+    The result is meant for the jit_compile argument of model.compile, since a failure
+    inside model.fit would stop the training instead of falling back.
+    """
+
+    @tf.function(jit_compile=True)
+    def gradients(x, y):
+        with tf.GradientTape() as tape:
+            loss = tf.reduce_mean(tf.keras.losses.mean_squared_error(y, model(x, training=True)))
+        return loss, tape.gradient(loss, model.trainable_variables)
+
+    to_tensor = lambda data: tf.nest.map_structure(lambda array: tf.constant(array, dtype=tf.float32), data)
+    try:
+        gradients(to_tensor(x), to_tensor(y))
+    except XLA_ERRORS as error:
+        report_fallback(f"the training step of {model.name}", error)
+        return False
+    return True
+
+
+def enable_xla(model: tf.keras.Model, x, y) -> bool:
+    """
+    Turns on the XLA compilation of model.fit, evaluate and predict if supports_xla, returns whether it did.
+    Call it after model.compile and after choosing the teacher forcing mode.
+    """
+    model.jit_compile = supports_xla(model, x, y)
+    return model.jit_compile
+
+
+def make_predict_function(model: tf.keras.Model, jit_compile: bool):
+    """
+    Returns a function (control_points, finger) -> predictions of the model in its current
+    teacher forcing mode, compiled with XLA if jit_compile. For the rollout without teacher forcing
+    control_points only needs the first step: shape (None, 1, 2).
+    """
+    return make_function(
+        lambda control_points, finger: model((control_points, finger), training=False),
+        jit_compile,
+        name=f"the prediction of {model.name}",
+    )
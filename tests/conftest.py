@@ -0,0 +1,13 @@
+"""
+    The modules are imported like the scripts import them, with src on the path,
+    and the data paths are relative to the root of the repository.
+"""
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.append(os.path.join(ROOT_DIR, "src"))
+sys.path.append(os.path.join(ROOT_DIR, "src", "final_experiment"))
+os.chdir(ROOT_DIR)
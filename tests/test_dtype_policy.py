@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import dataset
+from utils.dataset_creation import create_calculated_values_dataset
+from utils.dtype_policy import FLOAT_DTYPE, check_dataset
+
+
+def get_synthetic_recording(dtype, num_steps=100, num_control_points=47):
+    """Polygons, finger positions and forces of a recording, like the normalized ones of dataset.py"""
+    rng = np.random.default_rng(0)
+    polygons = rng.normal(size=(num_steps, num_control_points, 2)).astype(dtype)
+    finger_positions = rng.normal(size=(num_steps, 2)).astype(dtype)
+    forces = rng.uniform(size=num_steps).astype(dtype)
+    return polygons, finger_positions, forces
+
+
+def test_bundle_datasets_are_float32(tmp_path):
+    bundle_file = str(tmp_path / "dataset_bundle.npz")
+    dataset.build_dataset_bundle(bundle_file)
+
+    train_dataset, validation_dataset = dataset.load_datasets(bundle_file)
+    test_dataset = dataset.load_test_dataset(bundle_file)
+    for data in (train_dataset, validation_dataset, test_dataset):
+        for key, array in data.items():
+            assert array.dtype == FLOAT_DTYPE, key
+
+
+def test_calculated_values_dataset_keeps_float32():
+    X_control_points, X_finger, Y = create_calculated_values_dataset(*get_synthetic_recording(np.float32))
+
+    assert X_control_points.dtype == X_finger.dtype == Y.dtype == FLOAT_DTYPE
+    check_dataset({"X_control_points": X_control_points, "X_finger": X_finger, "Y": Y})
+
+
+def test_check_dataset_rejects_float64():
+    X_control_points, X_finger, Y = create_calculated_values_dataset(*get_synthetic_recording(np.float64))
+
+    with pytest.raises(TypeError, match="X_finger"):
+        check_dataset({"X_control_points": X_control_points, "X_finger": X_finger, "Y": Y})
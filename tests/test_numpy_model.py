@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from inference.export_weights import export_weights
+from inference.numpy_model import NumpyDeformationTracker
+from subclassing_models import DeformationTrackerBiFlowModel, DeformationTrackerModel
+from utils.model_factory import get_model_factory
+
+NUM_STEPS: int = 100
+TOLERANCE: float = 1e-4
+STORED_MODEL: str = "saved_models/best_14_50n_biflow"
+
+
+def get_random_inputs(finger_width: int, batch_size: int = 8):
+    rng = np.random.default_rng(0)
+    control_points = rng.normal(scale=0.5, size=(batch_size, NUM_STEPS, 2)).astype(np.float32)
+    finger = rng.normal(scale=0.5, size=(batch_size, NUM_STEPS, finger_width)).astype(np.float32)
+    return control_points, finger
+
+
+# every combination traces the 100 steps of the rollout, these two cover both classes and both widths
+@pytest.mark.parametrize("model_class, finger_width", [(DeformationTrackerModel, 3), (DeformationTrackerBiFlowModel, 4)])
+@pytest.mark.parametrize("teacher_forcing", [True, False])
+def test_numpy_model_matches_keras(model_class, finger_width, teacher_forcing):
+    factory = get_model_factory(model_class, finger_width, NUM_STEPS)
+    rng = np.random.default_rng(1)
+    weights = [rng.normal(scale=0.2, size=weight.shape).astype(np.float32) for weight in factory.model.get_weights()]
+    factory.model.set_weights(weights)
+    control_points, finger = get_random_inputs(finger_width)
+
+    expected = factory.predict(control_points, finger, teacher_forcing)
+    predicted = NumpyDeformationTracker(weights).predict(control_points, finger, teacher_forcing)
+
+    np.testing.assert_allclose(predicted, expected, atol=TOLERANCE)
+
+
+def test_exported_model_matches_keras(tmp_path):
+    output_file = str(tmp_path / "model.npz")
+    export_weights(STORED_MODEL, output_file)
+    factory = get_model_factory(DeformationTrackerBiFlowModel, 4, NUM_STEPS)
+    factory.load_weights(STORED_MODEL)
+    control_points, finger = get_random_inputs(4)
+
+    for teacher_forcing in (True, False):
+        np.testing.assert_allclose(
+            NumpyDeformationTracker.load(output_file).predict(control_points, finger, teacher_forcing),
+            factory.predict(control_points, finger, teacher_forcing),
+            atol=TOLERANCE,
+        )
+
+
+def test_numpy_model_rejects_other_finger_widths():
+    weights = get_model_factory(DeformationTrackerBiFlowModel, 4, NUM_STEPS).model.get_weights()
+    weights[0] = np.zeros((2 + 5, weights[0].shape[1]), dtype=np.float32)
+
+    with pytest.raises(Exception, match="finger input of width 5"):
+        NumpyDeformationTracker(weights)